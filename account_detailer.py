@@ -27,66 +27,94 @@ class AccountDetailer:
         statements = self.statements_by_folder[folder_name]
         output_file = self.output_dir / f"{folder_name}_transactions.txt"
         
-        with open(output_file, 'w') as f:
-            f.write(f"Transaction Details for {folder_name}\n")
-            f.write("=" * 100 + "\n\n")
+        # Build the report in memory and write it in one call
+        parts = []
+        parts.append(f"Transaction Details for {folder_name}\n")
+        parts.append("=" * 100 + "\n\n")
+        
+        # Dates and amounts repeat across rows, so format each distinct value once
+        date_text = {}
+        amount_text = {}
             
-            for statement in statements:
-                # Write statement header
-                f.write(f"Statement Period: {statement.start_date.date()} to {statement.end_date.date()}\n")
+        for statement in statements:
+            # Write statement header
+            parts.append(f"Statement Period: {statement.start_date.date()} to {statement.end_date.date()}\n")
+                
+            # Write balance information
+            if hasattr(statement, 'credit_limit'):
+                if statement.credit_limit:
+                    parts.append(f"Credit limit: £{statement.credit_limit:.2f}\n")
+                parts.append(f"Current balance: £{statement.current_balance:.2f}\n")
+                if statement.available_credit:
+                    parts.append(f"Available credit: £{statement.available_credit:.2f}\n")
+            elif hasattr(statement, 'start_balance'):
+                parts.append(f"Opening balance: £{statement.start_balance:.2f}\n")
+                parts.append(f"Closing balance: £{statement.end_balance:.2f}\n")
                 
-                # Write balance information
-                if hasattr(statement, 'credit_limit'):
-                    if statement.credit_limit:
-                        f.write(f"Credit limit: £{statement.credit_limit:.2f}\n")
-                    f.write(f"Current balance: £{statement.current_balance:.2f}\n")
-                    if statement.available_credit:
-                        f.write(f"Available credit: £{statement.available_credit:.2f}\n")
-                elif hasattr(statement, 'start_balance'):
-                    f.write(f"Opening balance: £{statement.start_balance:.2f}\n")
-                    f.write(f"Closing balance: £{statement.end_balance:.2f}\n")
+            # All transactions in a statement share a type, so resolve optional fields once
+            sample = statement.transactions[0] if statement.transactions else None
+            has_post_date = hasattr(sample, 'post_date')
+            if hasattr(sample, 'merchant_category'):
+                category_attr = 'merchant_category'
+            elif hasattr(sample, 'category'):
+                category_attr = 'category'
+            else:
+                category_attr = None
+            has_running_total = hasattr(sample, 'running_total')
                 
-                # Prepare transaction data for table
-                table_data = []
-                for trans in statement.transactions:
-                    # Format post date if exists
-                    post_date = ""
-                    if hasattr(trans, 'post_date') and trans.post_date != trans.date:
-                        post_date = f"(posted {trans.post_date.date()})"
+            # Prepare transaction data for table
+            table_data = []
+            for trans in statement.transactions:
+                # Format post date if exists
+                post_date = ""
+                if has_post_date and trans.post_date != trans.date:
+                    post_date = date_text.get(trans.post_date)
+                    if post_date is None:
+                        post_date = date_text[trans.post_date] = str(trans.post_date.date())
+                    post_date = f"(posted {post_date})"
                     
-                    # Format category if exists
-                    category = ""
-                    if hasattr(trans, 'merchant_category') and trans.merchant_category:
-                        category = f"[{trans.merchant_category}]"
-                    elif hasattr(trans, 'category') and trans.category:
-                        category = f"[{trans.category}]"
+                # Format category if exists
+                category = ""
+                if category_attr:
+                    category_value = getattr(trans, category_attr)
+                    if category_value:
+                        category = f"[{category_value}]"
                     
-                    # Prepare transaction row
-                    transaction_row = [
-                        trans.date.date(),
-                        post_date,
-                        f"ID: {trans.transaction_id}",  # Include transaction_id
-                        trans.type,
-                        f"£{trans.amount:,.2f}",
-                        f"{trans.description} {category}"
-                    ]
+                trans_date = date_text.get(trans.date)
+                if trans_date is None:
+                    trans_date = date_text[trans.date] = str(trans.date.date())
+                amount = amount_text.get(trans.amount)
+                if amount is None:
+                    amount = amount_text[trans.amount] = f"£{trans.amount:,.2f}"
                     
-                    # Include running_total only if it exists
-                    if hasattr(trans, 'running_total'):
-                        transaction_row.append(f"£{trans.running_total:,.2f}") 
-                    else:
-                        transaction_row.append("")  # Add an empty string if running_total is not present
+                # Prepare transaction row
+                transaction_row = [
+                    trans_date,
+                    post_date,
+                    f"ID: {trans.transaction_id}",  # Include transaction_id
+                    trans.type,
+                    amount,
+                    f"{trans.description} {category}"
+                ]
                     
-                    table_data.append(transaction_row)
+                # Include running_total only if it exists
+                if has_running_total:
+                    transaction_row.append(f"£{trans.running_total:,.2f}") 
+                else:
+                    transaction_row.append("")  # Add an empty string if running_total is not present
+                    
+                table_data.append(transaction_row)
                 
-                # Write transaction table
-                f.write("\nTransactions:\n")
-                f.write(tabulate(
-                    table_data,
-                    headers=['Date', 'Posted', 'Transaction ID', 'Type', 'Amount', 'Description', 'Running Total'],
-                    tablefmt='grid'
-                ))
-                f.write("\n\n" + "=" * 100 + "\n\n")
+            # Write transaction table
+            parts.append("\nTransactions:\n")
+            parts.append(tabulate(
+                table_data,
+                headers=['Date', 'Posted', 'Transaction ID', 'Type', 'Amount', 'Description', 'Running Total'],
+                tablefmt='grid'
+            ))
+            parts.append("\n\n" + "=" * 100 + "\n\n")
+        
+        output_file.write_text(''.join(parts))
     
     def generate_all_details(self) -> None:
         """Generate detailed reports for all accounts"""
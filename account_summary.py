@@ -38,7 +38,6 @@ class AccountSummarizer:
     
     def _update_dates_config(self) -> None:
         """Update dates configuration with current date for processed folders"""
-        today = datetime.now().strftime('%Y-%m-%d')
         updated = False
         
         for summary in self.summaries:
@@ -58,25 +57,38 @@ class AccountSummarizer:
         for folder_name, statements in self.statements_by_folder.items():
             total_income = Decimal('0')
             total_expense = Decimal('0')
-            all_transactions_dates = []
+            first_transaction = None
+            last_transaction = None
             num_transactions = 0
             running_total = None
             
             for statement in statements:
-                for trans in statement.transactions:
-                    amount = abs(trans.amount)
-                    if trans.amount >= 0:
+                transactions = statement.transactions
+                if not transactions:
+                    continue
+                
+                for trans in transactions:
+                    # Branch on sign first so only expenses need negating
+                    amount = trans.amount
+                    if amount >= 0:
                         total_income += amount
                     else:
-                        total_expense += amount
-                    
-                    all_transactions_dates.append(trans.date)
-                    num_transactions += 1
+                        total_expense -= amount
                     
-                    if hasattr(trans, 'running_total'):
-                        running_total = trans.running_total
+                    date = trans.date
+                    if first_transaction is None or date < first_transaction:
+                        first_transaction = date
+                    if last_transaction is None or date > last_transaction:
+                        last_transaction = date
+                
+                # Count and balance are per statement, not per transaction
+                num_transactions += len(transactions)
+                
+                # All transactions in a statement share a type; the last one holds the balance
+                if hasattr(transactions[-1], 'running_total'):
+                    running_total = transactions[-1].running_total
             
-            if all_transactions_dates:
+            if num_transactions:
                 # Get last checked date from config
                 last_checked = None
                 if folder_name in self.dates_config:
@@ -92,8 +104,8 @@ class AccountSummarizer:
                     folder_name=folder_name,
                     total_income=total_income,
                     total_expense=total_expense,
-                    first_transaction=min(all_transactions_dates),
-                    last_transaction=max(all_transactions_dates),
+                    first_transaction=first_transaction,
+                    last_transaction=last_transaction,
                     num_transactions=num_transactions,
                     last_checked=last_checked,
                     running_total=running_total
@@ -4,99 +4,158 @@ from typing import Dict, List, Set, Tuple, Optional
 from decimal import Decimal
 import re
 import csv
+from functools import lru_cache
 from parse_all_transactions import parse_all_account_folders
-from Levenshtein import distance
+from rapidfuzz.distance.Levenshtein import distance
 
+# Keywords that map a description straight to a category, in priority order
+_CATEGORY_KEYWORDS = [
+    ('MBNA PLATINUM', 'CREDIT CARD PAYMENT'),
+    ('BARCLAYCARD VISA', 'CREDIT CARD PAYMENT'),
+    ('HALIFAX DDR', 'CREDIT CARD PAYMENT'),
+    ('JOHN LEWIS', 'CREDIT CARD PAYMENT'),
+    ('VIRGIN MONEY', 'CREDIT CARD PAYMENT'),
+    ('MBNA CREDIT CARD', 'CREDIT CARD PAYMENT'),
+    ('BARCLAYCARD', 'CREDIT CARD PAYMENT'),
+    ('HALIFAX CREDIT', 'CREDIT CARD PAYMENT'),
+    ('4929153195605', 'CREDIT CARD PAYMENT'),
+    ('ALDI', 'ALDI STORE'),
+    ('SAINSBURY', 'SAINSBURYS STORE'),
+    ('APSLEY STN', 'APSLEY STATION'),
+    ('SUPERCUTS', 'SUPERCUTS'),
+    ('MORTGAGE', 'MORTGAGE'),
+    ('ANIMAL HEALTHCARE', 'ANIMAL HEALTHCARE'),
+]
+_CATEGORY_RANK = {keyword: rank for rank, (keyword, _) in enumerate(_CATEGORY_KEYWORDS)}
+# Zero-width lookahead so every keyword occurrence is seen, even when they overlap
+_CATEGORY_RE = re.compile('(?=(' + '|'.join(re.escape(k) for k, _ in _CATEGORY_KEYWORDS) + '))')
+_PAYMENT_RE = re.compile(r'\b(PAYMENT|THANKYOU|THANK YOU)\b')
+
+# Patterns applied in order to strip the variable parts of a description
+_TIME_RE = re.compile(r'\d{2}(?::\d{2})?(?::\d{2})?')
+_DATE_RE = re.compile(r'\b\d{1,4}[-/.]\d{1,2}[-/.]\d{2,4}\b')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+# Company suffixes, common words and city names in a single pass
+_STRIP_WORDS_RE = re.compile(
+    r'\b(?:LTD|LIMITED|UK|GB|INT|INTL|INTERNATIONAL|THE|AND|OF|IN|AT|TO|FROM)\b'
+    r'|LONDON|MANCHESTER|BIRMINGHAM|LEEDS|BRISTOL'
+)
+
+@lru_cache(maxsize=65536)
 def clean_description(desc: str) -> str:
     """Further clean description to group similar transactions"""
     # Convert to uppercase for comparison
     desc = desc.upper()
     
-    # Special handling for credit card payments
-    if any(card in desc for card in [
-        'MBNA PLATINUM',
-        'BARCLAYCARD VISA',
-        'HALIFAX DDR',
-        'JOHN LEWIS',
-        'VIRGIN MONEY',
-        'MBNA CREDIT CARD',
-        'BARCLAYCARD',
-        'HALIFAX CREDIT',
-        '4929153195605'
-    ]):
-        return 'CREDIT CARD PAYMENT'
-    
-    # Special handling for Aldi variations
-    if 'ALDI' in desc:
-        return 'ALDI STORE'
-    
-    # Special handling for Sainsbury's variations
-    if any(s in desc for s in ['SAINSBURY', 'SAINSBURYS', "SAINSBURY'S"]):
-        return 'SAINSBURYS STORE'
-    
-    # Special handling for Apsley Station
-    if 'APSLEY STN' in desc:
-        return 'APSLEY STATION'
-    
-    if  'SUPERCUTS' in desc:
-        return 'SUPERCUTS'
-    
-    if 'MORTGAGE' in desc:
-        return 'MORTGAGE'
-    
-    if 'ANIMAL HEALTHCARE' in desc:
-        return 'ANIMAL HEALTHCARE'
+    # Special handling for known merchants and credit card payments
+    ranks = [_CATEGORY_RANK[m.group(1)] for m in _CATEGORY_RE.finditer(desc)]
+    if ranks:
+        return _CATEGORY_KEYWORDS[min(ranks)][1]
     
     if desc.startswith('PRIME VIDEO'):
         return 'PRIME VIDEO'
     # Special handling for payment variations
-    if any(word in desc for word in ['- THAN', 'THANK YOU']):
-        # Extract the first part before PAYMENT/THANKYOU
-        parts = re.split(r'\b(PAYMENT|THANKYOU|THANK YOU)\b', desc)
-        if len(parts) > 1:
-            return f"CREDIT CARD PAYMENT"
-
+    if ('- THAN' in desc or 'THANK YOU' in desc) and _PAYMENT_RE.search(desc):
+        return "CREDIT CARD PAYMENT"
     
     # Remove dates, times, and reference numbers
-    desc = re.sub(r'\d{2}(?::\d{2})?(?::\d{2})?', '', desc)
-    desc = re.sub(r'\b\d{1,4}[-/.]\d{1,2}[-/.]\d{2,4}\b', '', desc)
+    desc = _TIME_RE.sub('', desc)
+    desc = _DATE_RE.sub('', desc)
     
     # Remove common variable parts
-    desc = re.sub(r'\b\d+\b', '', desc)  # Remove standalone numbers
-    desc = re.sub(r'[^\w\s]', '', desc)  # Remove punctuation
-    desc = re.sub(r'\b(LTD|LIMITED|UK|GB|INT|INTL|INTERNATIONAL)\b', '', desc)  # Remove common company suffixes
-    desc = re.sub(r'\b(THE|AND|OF|IN|AT|TO|FROM)\b', '', desc)  # Remove common words
-    desc = re.sub(r'(LONDON|MANCHESTER|BIRMINGHAM|LEEDS|BRISTOL)', '', desc)  # Remove city names
+    desc = _NUMBER_RE.sub('', desc)  # Remove standalone numbers
+    desc = _PUNCTUATION_RE.sub('', desc)  # Remove punctuation
+    desc = _STRIP_WORDS_RE.sub('', desc)  # Remove company suffixes, common words and city names
     
     # Remove extra spaces and trim
     desc = ' '.join(desc.split())
     return desc.strip()
 
-def find_similar_group(clean_desc: str, existing_groups: Dict[str, Tuple[List[str], Decimal]], threshold: int = 5) -> Optional[str]:
+class BKTree:
+    """BK-tree of strings keyed on Levenshtein distance, used to find similar group keys"""
+    
+    def __init__(self):
+        # Each node is [word, insertion order, {distance: child node}]
+        self._root = None
+        self._size = 0
+        self._words = set()
+    
+    def add(self, word: str) -> None:
+        """
+        Insert a word into the tree
+        
+        Args:
+            word: Word to insert
+        """
+        node = [word, self._size, {}]
+        self._size += 1
+        self._words.add(word)
+        if self._root is None:
+            self._root = node
+            return
+        
+        current = self._root
+        while True:
+            d = distance(word, current[0])
+            child = current[2].get(d)
+            if child is None:
+                current[2][d] = node
+                return
+            current = child
+    
+    def find(self, word: str, threshold: int) -> Optional[str]:
+        """
+        Find the earliest inserted word within threshold edit distance of the given word
+        
+        Args:
+            word: Word to match
+            threshold: Maximum Levenshtein distance to consider similar
+            
+        Returns:
+            Matching word or None if no match found
+        """
+        # A word is only added when no earlier word is within threshold of it,
+        # so an exact hit is always the earliest match
+        if word in self._words:
+            return word
+        
+        best = None
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            current = stack.pop()
+            d = distance(word, current[0])
+            if d <= threshold and (best is None or current[1] < best[1]):
+                best = current
+            # Triangle inequality: only children in [d - threshold, d + threshold] can match
+            for child_dist, child in current[2].items():
+                if d - threshold <= child_dist <= d + threshold:
+                    stack.append(child)
+        return best[0] if best else None
+
+def find_similar_group(clean_desc: str, group_index: BKTree, threshold: int = 5) -> Optional[str]:
     """
     Find an existing group that's similar to the given description
     
     Args:
         clean_desc: Cleaned description to match
-        existing_groups: Existing transaction groups
+        group_index: BK-tree of existing group keys
         threshold: Maximum Levenshtein distance to consider similar
         
     Returns:
         Key of matching group or None if no match found
     """
-    for group_key in existing_groups.keys():
-        if distance(clean_desc, group_key) <= threshold:
-            return group_key
-    return None
+    return group_index.find(clean_desc, threshold)
 
-def group_transactions(statements_by_folder: Dict[str, List]) -> Dict[str, Tuple[List[str], Decimal]]:
+def group_transactions(statements_by_folder: Dict[str, List]) -> Dict[str, Tuple[Set[str], int, Decimal]]:
     """
     Process all statements and group similar transactions using Levenshtein distance
     
     Returns:
-        Dict mapping cleaned descriptions to tuple of (raw descriptions, total amount)
+        Dict mapping cleaned descriptions to tuple of (unique raw descriptions, occurrences, total amount)
     """
-    transaction_groups = defaultdict(lambda: ([], Decimal('0')))
+    transaction_groups = defaultdict(lambda: (set(), 0, Decimal('0')))
+    group_index = BKTree()
     
     # Process all folders
     for statements in statements_by_folder.values():
@@ -108,18 +167,21 @@ def group_transactions(statements_by_folder: Dict[str, List]) -> Dict[str, Tuple
                     continue
                     
                 # Find similar existing group or use current description
-                group_key = find_similar_group(clean_desc, transaction_groups) or clean_desc
+                group_key = find_similar_group(clean_desc, group_index)
+                if group_key is None:
+                    group_key = clean_desc
+                    group_index.add(group_key)
                 
-                # Get existing variations and total
-                variations, total = transaction_groups[group_key]
-                # Add new variation and update total
-                variations.append(trans.description)
+                # Get existing variations, count and total
+                variations, count, total = transaction_groups[group_key]
+                # Add new variation and update count and total
+                variations.add(trans.description)
                 amount = trans.amount
-                transaction_groups[group_key] = (variations, total + amount)
+                transaction_groups[group_key] = (variations, count + 1, total + amount)
     
     return transaction_groups
 
-def write_categories_to_csv(groups: Dict[str, Tuple[List[str], Decimal]], total_spending: Decimal, total_income: Decimal, output_path: Path) -> None:
+def write_categories_to_csv(groups: Dict[str, Tuple[Set[str], int, Decimal]], total_spending: Decimal, total_income: Decimal, output_path: Path) -> None:
     """
     Write transaction categories to CSV file
     
@@ -132,7 +194,7 @@ def write_categories_to_csv(groups: Dict[str, Tuple[List[str], Decimal]], total_
     # Sort groups by absolute amount
     sorted_groups = sorted(
         groups.items(),
-        key=lambda x: (abs(x[1][1]), len(x[1][0])),
+        key=lambda x: (abs(x[1][2]), x[1][1]),
         reverse=True
     )
     
@@ -175,15 +237,15 @@ def write_categories_to_csv(groups: Dict[str, Tuple[List[str], Decimal]], total_
         ])
         
         # Write category rows
-        for clean_desc, (variations, total) in sorted_groups:
+        for clean_desc, (variations, count, total) in sorted_groups:
             percentage = (abs(total) / abs(total_spending if total < 0 else total_income)) * 100
             writer.writerow([
                 clean_desc,
                 f'{"" if total < 0 else "+"}£{abs(total):.2f}',
                 f'{percentage:.1f}',
                 'Spending' if total < 0 else 'Income',
-                len(variations),
-                ', '.join(sorted(set(variations)))
+                count,
+                ', '.join(sorted(variations))
             ])
 
 def main():
@@ -202,8 +264,13 @@ def main():
     groups = group_transactions(statements_by_folder)
     
     # Calculate totals
-    total_spending = sum(total for _, (_, total) in groups.items() if total < 0)
-    total_income = sum(total for _, (_, total) in groups.items() if total > 0)
+    total_spending = Decimal('0')
+    total_income = Decimal('0')
+    for _, _, total in groups.values():
+        if total < 0:
+            total_spending += total
+        elif total > 0:
+            total_income += total
     
     # Write to CSV
     output_path = base_path / 'transaction_categories.csv'
@@ -222,12 +289,12 @@ def main():
     # Sort and print categories
     sorted_groups = sorted(
         groups.items(),
-        key=lambda x: (abs(x[1][1]), len(x[1][0])),
+        key=lambda x: (abs(x[1][2]), x[1][1]),
         reverse=True
     )
     
-    for clean_desc, (variations, total) in sorted_groups:
-        unique_variations = sorted(set(variations))
+    for clean_desc, (variations, count, total) in sorted_groups:
+        unique_variations = sorted(variations)
         print(f"\nCategory: {clean_desc}")
         print(f"Total amount: {'£' if total < 0 else '+£'}{abs(total):.2f}")
         percentage = (abs(total) / abs(total_spending if total < 0 else total_income)) * 100
@@ -235,7 +302,7 @@ def main():
         print("Variations:")
         for var in unique_variations:
             print(f"  - {var}")
-        print(f"Total occurrences: {len(variations)}")
+        print(f"Total occurrences: {count}")
         print("-" * 50)
 
 if __name__ == "__main__":
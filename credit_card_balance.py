@@ -1,11 +1,13 @@
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 from typing import Dict, List, Any
+from operator import attrgetter
 import re
 import json
 from tabulate import tabulate
 from parse_all_transactions import parse_all_account_folders
+from parsers.file_cache import JSON_FILES
 from collections import defaultdict
 
 class CreditCardBalance:
@@ -51,9 +53,8 @@ class CreditCardBalance:
             
             return default_config
         
-        # Load existing config
-        with open(self.config_path, 'r') as f:
-            return json.load(f)
+        # Load existing config, reusing the parsed file while it is unchanged
+        return JSON_FILES.get(self.config_path)
     
     def find_interest_charges(self, statements_by_folder: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
         """
@@ -64,18 +65,26 @@ class CreditCardBalance:
         """
         interest_by_card = defaultdict(list)
         
+        # Map each folder to the interest patterns of the cards it belongs to, compiling each pattern once
+        folder_patterns = defaultdict(list)
         for card_name, config in self.card_configs.items():
-            folder_pattern = config['folder_pattern']
-            interest_pattern = config['interest_pattern']
+            folder_pattern = re.compile(config['folder_pattern'], re.IGNORECASE)
+            interest_pattern = re.compile(config['interest_pattern'], re.IGNORECASE)
             
-            # Find matching folder
-            for folder_name, statements in statements_by_folder.items():
-                if re.search(folder_pattern, folder_name, re.IGNORECASE):
-                    # Process statements for this folder
-                    for statement in statements:
-                        for trans in statement.transactions:
-                            if re.search(interest_pattern, trans.description, re.IGNORECASE):
-                                interest_by_card[folder_name].append(trans)
+            for folder_name in statements_by_folder:
+                if folder_pattern.search(folder_name):
+                    folder_patterns[folder_name].append(interest_pattern)
+        
+        # Process statements only for folders belonging to a card
+        for folder_name, interest_patterns in folder_patterns.items():
+            statements = statements_by_folder[folder_name]
+            for interest_pattern in interest_patterns:
+                # Match each statement's descriptions in one comprehension over the bound search
+                search = interest_pattern.search
+                for statement in statements:
+                    matches = [trans for trans in statement.transactions if search(trans.description)]
+                    if matches:
+                        interest_by_card[folder_name].extend(matches)
         
         return interest_by_card
     
@@ -94,81 +103,89 @@ class CreditCardBalance:
         output_dir.mkdir(parents=True, exist_ok=True)
         output_file = output_dir / "credit_card_interest.txt"
         
-        with open(output_file, 'w') as f:
-            f.write("Credit Card Interest Report\n")
-            f.write("=" * 100 + "\n\n")
+        parts = []
+        parts.append("Credit Card Interest Report\n")
+        parts.append("=" * 100 + "\n\n")
+        
+        total_interest = Decimal('0')
+        total_charges = 0
+        summary_data = []
+        
+        for card_name, transactions in interest_by_card.items():
+            if not transactions:
+                continue
+                
+            parts.append(f"\n{card_name}\n")
+            parts.append("-" * len(card_name) + "\n")
             
-            total_interest = Decimal('0')
-            total_charges = 0
-            summary_data = []
+            # Calculate statistics in a single pass
+            total_card_interest = min_interest = max_interest = transactions[0].amount
+            for t in transactions[1:]:
+                amount = t.amount
+                total_card_interest += amount
+                if amount < min_interest:
+                    min_interest = amount
+                elif amount > max_interest:
+                    max_interest = amount
+            count = len(transactions)
+            avg_interest = total_card_interest / count
             
-            for card_name, transactions in interest_by_card.items():
-                if not transactions:
-                    continue
-                    
-                f.write(f"\n{card_name}\n")
-                f.write("-" * len(card_name) + "\n")
-                
-                # Calculate statistics
-                total_card_interest = sum(t.amount for t in transactions)
-                avg_interest = total_card_interest / len(transactions)
-                min_interest = min(t.amount for t in transactions)
-                max_interest = max(t.amount for t in transactions)
-                
-                total_interest += total_card_interest
-                total_charges += len(transactions)
-                
-                # Prepare transaction table
-                table_data = [
-                    [t.date.date(), f"£{abs(t.amount):,.2f}", t.description]
-                    for t in sorted(transactions, key=lambda x: x.date)
-                ]
-                
-                # Write statistics
-                f.write(f"Total interest charges: £{abs(total_card_interest):,.2f}\n")
-                f.write(f"Average monthly interest: £{abs(avg_interest):,.2f}\n")
-                f.write(f"Min interest: £{abs(min_interest):,.2f}\n")
-                f.write(f"Max interest: £{abs(max_interest):,.2f}\n")
-                f.write(f"Number of charges: {len(transactions)}\n\n")
-                
-                # Write transactions table
-                f.write(tabulate(
-                    table_data,
-                    headers=['Date', 'Amount', 'Description'],
-                    tablefmt='grid'
-                ))
-                f.write("\n\n")
-                
-                # Add to summary data
-                summary_data.append([
-                    card_name,
-                    len(transactions),
-                    f"£{abs(avg_interest):,.2f}",
-                    f"£{abs(total_card_interest):,.2f}"
-                ])
+            total_interest += total_card_interest
+            total_charges += count
             
-            # Add totals row to summary data
-            avg_total = total_interest / total_charges if total_charges > 0 else Decimal('0')
-            summary_data.append([
-                "TOTAL",
-                total_charges,
-                f"£{abs(avg_total):,.2f}",
-                f"£{abs(total_interest):,.2f}"
-            ])
+            # Prepare transaction table
+            table_data = [
+                [t.date.date(), f"£{abs(t.amount):,.2f}", t.description]
+                for t in sorted(transactions, key=attrgetter('date'))
+            ]
             
-            # Write overall summary
-            f.write("\nOverall Summary\n")
-            f.write("=" * 50 + "\n")
-            f.write(f"Total interest paid across all cards: £{abs(total_interest):,.2f}\n")
-            f.write(f"Total number of interest charges: {total_charges}\n")
-            f.write(f"Average interest per charge: £{abs(avg_total):,.2f}\n\n")
+            # Write statistics
+            parts.append(f"Total interest charges: £{abs(total_card_interest):,.2f}\n")
+            parts.append(f"Average monthly interest: £{abs(avg_interest):,.2f}\n")
+            parts.append(f"Min interest: £{abs(min_interest):,.2f}\n")
+            parts.append(f"Max interest: £{abs(max_interest):,.2f}\n")
+            parts.append(f"Number of charges: {count}\n\n")
             
-            # Write summary table with totals row
-            f.write(tabulate(
-                summary_data,
-                headers=['Card', 'Charges', 'Avg Monthly', 'Total Interest'],
+            # Write transactions table
+            parts.append(tabulate(
+                table_data,
+                headers=['Date', 'Amount', 'Description'],
                 tablefmt='grid'
             ))
+            parts.append("\n\n")
+            
+            # Add to summary data
+            summary_data.append([
+                card_name,
+                count,
+                f"£{abs(avg_interest):,.2f}",
+                f"£{abs(total_card_interest):,.2f}"
+            ])
+        
+        # Add totals row to summary data
+        avg_total = total_interest / total_charges if total_charges > 0 else Decimal('0')
+        summary_data.append([
+            "TOTAL",
+            total_charges,
+            f"£{abs(avg_total):,.2f}",
+            f"£{abs(total_interest):,.2f}"
+        ])
+        
+        # Write overall summary
+        parts.append("\nOverall Summary\n")
+        parts.append("=" * 50 + "\n")
+        parts.append(f"Total interest paid across all cards: £{abs(total_interest):,.2f}\n")
+        parts.append(f"Total number of interest charges: {total_charges}\n")
+        parts.append(f"Average interest per charge: £{abs(avg_total):,.2f}\n\n")
+        
+        # Write summary table with totals row
+        parts.append(tabulate(
+            summary_data,
+            headers=['Card', 'Charges', 'Avg Monthly', 'Total Interest'],
+            tablefmt='grid'
+        ))
+        
+        output_file.write_text(''.join(parts))
         
         print(f"Report written to {output_file}")
     
@@ -176,22 +193,24 @@ class CreditCardBalance:
         """Generate monthly summary chart of interest charges"""
         output_file = output_dir / "monthly_interest_summary.txt"
         
-        # Collect all months and cards
+        # Collect all months and cards; months are keyed as a count of months (year * 12 + month - 1)
         months_set = set()
         monthly_data = defaultdict(lambda: defaultdict(list))
         
         for card_name, transactions in interest_by_card.items():
             for trans in transactions:
-                month_key = trans.date.strftime('%Y-%m')
+                month_key = trans.date.year * 12 + trans.date.month - 1
                 months_set.add(month_key)
                 monthly_data[card_name][month_key].append(trans)
 
         # for each card, if there are two entries for a month, move the second entry to the month after
         for card_name, transactions in monthly_data.items():
-            for month_key in sorted(transactions.keys()):
-                if len(transactions[month_key]) == 2 and month_key != max(transactions.keys()):
-                    next_month_key = datetime.strptime(month_key, '%Y-%m').replace(day=1) + timedelta(days=32)
-                    next_month_key = next_month_key.strftime('%Y-%m')
+            # Months are only added before the last month, so the last month is fixed
+            month_keys = sorted(transactions.keys())
+            last_month_key = month_keys[-1]
+            for month_key in month_keys:
+                if len(transactions[month_key]) == 2 and month_key != last_month_key:
+                    next_month_key = month_key + 1
                     if next_month_key not in transactions:
                         transactions[next_month_key] = [transactions[month_key][1]]
                         del transactions[month_key][1]
@@ -237,34 +256,37 @@ class CreditCardBalance:
         table_data.append(totals_row)
         
         # Write to file
-        with open(output_file, 'w') as f:
-            f.write("Monthly Interest Charges Summary\n")
-            f.write("=" * 100 + "\n\n")
-            
-            # Create headers with month names
-            headers = ['Card'] + [datetime.strptime(m, '%Y-%m').strftime('%b %Y') for m in months] + ['Total']
-            
-            f.write(tabulate(
-                table_data,
-                headers=headers,
-                tablefmt='grid',
-                stralign='right'
-            ))
-            
-            # Add analysis section
-            f.write("\n\nAnalysis\n")
-            f.write("=" * 50 + "\n")
-            f.write(f"Period covered: {headers[1]} to {headers[-2]}\n")
-            f.write(f"Total interest paid: £{abs(grand_total):,.2f}\n")
-            
-            # Find highest month
-            highest_month = max(month_totals.items(), key=lambda x: abs(x[1]))
-            highest_month_name = datetime.strptime(highest_month[0], '%Y-%m').strftime('%b %Y')
-            f.write(f"Highest interest month: {highest_month_name} (£{abs(highest_month[1]):,.2f})\n")
-            
-            # Find highest card
-            highest_card = max(card_totals.items(), key=lambda x: abs(x[1]))
-            f.write(f"Highest interest card: {highest_card[0]} (£{abs(highest_card[1]):,.2f})\n")
+        parts = []
+        parts.append("Monthly Interest Charges Summary\n")
+        parts.append("=" * 100 + "\n\n")
+        
+        # Create headers with month names
+        month_labels = {m: datetime(m // 12, m % 12 + 1, 1).strftime('%b %Y') for m in months}
+        headers = ['Card'] + [month_labels[m] for m in months] + ['Total']
+        
+        parts.append(tabulate(
+            table_data,
+            headers=headers,
+            tablefmt='grid',
+            stralign='right'
+        ))
+        
+        # Add analysis section
+        parts.append("\n\nAnalysis\n")
+        parts.append("=" * 50 + "\n")
+        parts.append(f"Period covered: {headers[1]} to {headers[-2]}\n")
+        parts.append(f"Total interest paid: £{abs(grand_total):,.2f}\n")
+        
+        # Find highest month
+        highest_month = max(month_totals.items(), key=lambda x: abs(x[1]))
+        highest_month_name = month_labels[highest_month[0]]
+        parts.append(f"Highest interest month: {highest_month_name} (£{abs(highest_month[1]):,.2f})\n")
+        
+        # Find highest card
+        highest_card = max(card_totals.items(), key=lambda x: abs(x[1]))
+        parts.append(f"Highest interest card: {highest_card[0]} (£{abs(highest_card[1]):,.2f})\n")
+        
+        output_file.write_text(''.join(parts))
         
         print(f"Monthly summary written to {output_file}")
 
@@ -1,5 +1,5 @@
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Any
 from pathlib import Path
 from parse_all_transactions import parse_all_account_folders  # Import the function to parse account folders
@@ -12,14 +12,13 @@ class DailySummary:
 
     def _calculate_daily_totals(self, folder_date_totals: Dict[str, Dict[datetime, float]]) -> Dict[str, float]:
         """Calculate the maximum running total for each date across all subfolders."""
-        daily_max = defaultdict(list)  # Dictionary to hold max running totals
+        daily_sums = defaultdict(int)  # Dictionary to hold summed running totals
 
         for folder_name, date_totals in folder_date_totals.items():
             for date, total in date_totals.items():
-                daily_max[date].append(total)
+                daily_sums[date] += total
 
-        daily_sums = {date: sum(totals) for date, totals in daily_max.items()}
-        return daily_sums
+        return dict(daily_sums)
     
     def get_summary(self) -> Dict[str, float]:
         """Return the daily summary of maximum running totals."""
@@ -30,20 +29,20 @@ class DailySummary:
     def folder_day_end_summary(self) -> Dict[str, Dict[datetime, float]]:
         """Calculate the last running total for each day across all statements."""
         folder_maps = {}
-        one_day = timedelta(days=1)
         for folder_name, statements in self.statements_by_folder.items():
             day_end_totals = {}  # Dictionary to hold the last running total for each day
             last_total, last_date = 0, None
             for statement in statements:
                 for trans in statement.transactions:
                     if hasattr(trans, 'running_total'):
-                        date_str = trans.date.strftime('%Y-%m-%d')  # Format date as string
-                        # convert back to date object
-                        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
+                        # Truncate to midnight of the transaction day
+                        date_obj = datetime(trans.date.year, trans.date.month, trans.date.day)
                         if last_date:
-                            while last_date < date_obj:
-                                day_end_totals[last_date] = last_total
-                                last_date += one_day
+                            # Fill every day up to this transaction in one call
+                            day_end_totals.update(dict.fromkeys(
+                                map(datetime.fromordinal, range(last_date.toordinal(), date_obj.toordinal())),
+                                last_total
+                            ))
                         last_total = trans.running_total
                         last_date = date_obj
             folder_maps[folder_name] = day_end_totals
@@ -1,47 +1,52 @@
 from pathlib import Path
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
+from operator import attrgetter
 from collections import defaultdict
 import json
 from tabulate import tabulate
 from parse_all_transactions import parse_all_account_folders
-from rc_tracker import RC_Tracker
+from rc_tracker import RC_Tracker, combine_transactions
 from credit_card_balance import CreditCardBalance
 
 class OtherPayments:
     """Tracks transactions not matched by RC_Tracker or credit card interest"""
     
-    def __init__(self, statements_by_folder: Dict[str, List[Any]], rc_patterns_path: Path = Path("config/rc_patterns.json")):
+    def __init__(self, statements_by_folder: Dict[str, List[Any]], rc_patterns_path: Path = Path("config/rc_patterns.json"),
+                 recurring_charges: Optional[Dict[str, Dict[str, Any]]] = None,
+                 interest_charges: Optional[Dict[str, List[Any]]] = None):
+        # Reuse recurring and interest charges when the caller has already computed them
         self.statements_by_folder = statements_by_folder
-        rc_tracker = RC_Tracker()
-        self.recurring_charges = rc_tracker.track_recurring_charges(statements_by_folder)
-        self.all_transactions = rc_tracker.all_transactions
+        if recurring_charges is None:
+            rc_tracker = RC_Tracker(rc_patterns_path)
+            self.recurring_charges = rc_tracker.track_recurring_charges(statements_by_folder)
+            self.all_transactions = rc_tracker.all_transactions
+        else:
+            self.recurring_charges = recurring_charges
+            self.all_transactions = combine_transactions(statements_by_folder)
         
         # Get credit card interest transactions
-        cc_balance = CreditCardBalance()
-        self.interest_charges = cc_balance.find_interest_charges(statements_by_folder)
+        if interest_charges is None:
+            cc_balance = CreditCardBalance()
+            interest_charges = cc_balance.find_interest_charges(statements_by_folder)
+        self.interest_charges = interest_charges
         
     # get all transactions from all subfolders, then remove all trnsactions matched by rc_tracker track_recurring_charges to get the unmatched transactions
     def get_unmatched_transactions(self):
         """Get transactions not matched by RC patterns or interest charges"""
-        # Build set of transaction IDs from recurring charges
-        rc_transaction_ids = set()
+        # Build a single set of matched transaction IDs from recurring and interest charges
+        matched_transaction_ids = set()
         for charge_data in self.recurring_charges.values():
-            for trans in charge_data['known_transactions'] + charge_data['new_transactions']:
-                rc_transaction_ids.add(trans.transaction_id)
-        
-        # Build set of transaction IDs from interest charges
-        interest_transaction_ids = set()
-        for card_name, charges in self.interest_charges.items():
-            for trans in charges:
-                interest_transaction_ids.add(trans.transaction_id)
+            matched_transaction_ids.update(t.transaction_id for t in charge_data['known_transactions'])
+            matched_transaction_ids.update(t.transaction_id for t in charge_data['new_transactions'])
+        for charges in self.interest_charges.values():
+            matched_transaction_ids.update(t.transaction_id for t in charges)
         
         # Filter out both recurring charges and interest transactions
         unmatched_transactions = [
             trans for trans in self.all_transactions 
-            if trans.transaction_id not in rc_transaction_ids
-            and trans.transaction_id not in interest_transaction_ids
+            if trans.transaction_id not in matched_transaction_ids
         ]
         
         return unmatched_transactions
@@ -55,10 +60,10 @@ class OtherPayments:
         # Get unmatched transactions
         unmatched_transactions = self.get_unmatched_transactions()
         
-        # Collect transactions by month
+        # Collect transactions by month, keyed as a count of months (year * 12 + month - 1)
         monthly_transactions = defaultdict(list)
         for trans in unmatched_transactions:
-            month_key = trans.date.strftime('%Y-%m')
+            month_key = trans.date.year * 12 + trans.date.month - 1
             monthly_transactions[month_key].append(trans)
         
         # Sort months
@@ -68,11 +73,16 @@ class OtherPayments:
         monthly_data = {}
         for month in sorted_months:
             transactions = monthly_transactions[month]
-            total_debit = sum(t.amount for t in transactions if t.amount < 0)
-            total_credit = sum(t.amount for t in transactions if t.amount > 0)
+            total_debit = Decimal('0')
+            total_credit = Decimal('0')
+            for t in transactions:
+                if t.amount < 0:
+                    total_debit += t.amount
+                elif t.amount > 0:
+                    total_credit += t.amount
             
-            # Sort transactions by amount
-            transactions.sort(key=lambda x: x.amount)
+            # Sort transactions by date, then amount, for the detail table
+            transactions.sort(key=attrgetter('date', 'amount'))
             
             monthly_data[month] = {
                 'transactions': transactions,
@@ -82,83 +92,83 @@ class OtherPayments:
             }
         
         # Write report
-        with open(output_file, 'w') as f:
-            f.write("Other Payments Report\n")
-            f.write("=" * 100 + "\n\n")
-            
-            # Write monthly summary table
-            summary_data = []
-            total_debit = Decimal('0')
-            total_credit = Decimal('0')
-            
-            for month in sorted_months:
-                data = monthly_data[month]
-                month_name = datetime.strptime(month, '%Y-%m').strftime('%b %Y')
-                summary_data.append([
-                    month_name,
-                    f"£{abs(data['total_debit']):,.2f}",
-                    f"£{data['total_credit']:,.2f}",
-                    f"£{data['net']:,.2f}",
-                    len(data['transactions'])
-                ])
-                total_debit += data['total_debit']
-                total_credit += data['total_credit']
-            
-            # Add totals row
+        parts = []
+        parts.append("Other Payments Report\n")
+        parts.append("=" * 100 + "\n\n")
+        
+        # Write monthly summary table
+        summary_data = []
+        total_debit = Decimal('0')
+        total_credit = Decimal('0')
+        
+        for month in sorted_months:
+            data = monthly_data[month]
+            month_name = datetime(month // 12, month % 12 + 1, 1).strftime('%b %Y')
             summary_data.append([
-                "TOTAL",
-                f"£{abs(total_debit):,.2f}",
-                f"£{total_credit:,.2f}",
-                f"£{total_credit + total_debit:,.2f}",
-                sum(len(d['transactions']) for d in monthly_data.values())
+                month_name,
+                f"£{abs(data['total_debit']):,.2f}",
+                f"£{data['total_credit']:,.2f}",
+                f"£{data['net']:,.2f}",
+                len(data['transactions'])
             ])
+            total_debit += data['total_debit']
+            total_credit += data['total_credit']
+        
+        # Add totals row
+        summary_data.append([
+            "TOTAL",
+            f"£{abs(total_debit):,.2f}",
+            f"£{total_credit:,.2f}",
+            f"£{total_credit + total_debit:,.2f}",
+            sum(len(d['transactions']) for d in monthly_data.values())
+        ])
+        
+        parts.append("Monthly Summary\n")
+        parts.append("-" * 80 + "\n")
+        parts.append(tabulate(
+            summary_data,
+            headers=['Month', 'Debits', 'Credits', 'Net', 'Count'],
+            tablefmt='grid',
+            stralign='right'
+        ))
+        parts.append("\n\n")
+        
+        # Write detailed transactions for each month
+        parts.append("Monthly Details\n")
+        parts.append("=" * 80 + "\n\n")
+        
+        for month in sorted_months:
+            data = monthly_data[month]
+            month_name = datetime(month // 12, month % 12 + 1, 1).strftime('%B %Y')
+            parts.append(f"\n{month_name}\n")
+            parts.append("-" * len(month_name) + "\n")
             
-            f.write("Monthly Summary\n")
-            f.write("-" * 80 + "\n")
-            f.write(tabulate(
-                summary_data,
-                headers=['Month', 'Debits', 'Credits', 'Net', 'Count'],
+            trans_data = []
+            for trans in data['transactions']:  # Already sorted by date
+                # Get subfolder name from transaction
+                subfolder = getattr(trans, 'account_name', None)  # Try account_name first
+                if not subfolder:
+                    subfolder = getattr(trans, 'account_id', 'Unknown')  # Fall back to account_id
+                
+                trans_data.append([
+                    trans.date.strftime('%d/%m/%Y'),
+                    f"£{trans.amount:,.2f}",
+                    trans.description,
+                    trans.type,
+                    subfolder,
+                    trans.transaction_id
+                ])
+            
+            parts.append(tabulate(
+                trans_data,
+                headers=['Date', 'Amount', 'Description', 'Type', 'Account', 'Transaction ID'],
                 tablefmt='grid',
-                stralign='right'
+                stralign='right',
+                disable_numparse=True  # Every cell is pre-formatted text
             ))
-            f.write("\n\n")
-            
-            # Write detailed transactions for each month
-            f.write("Monthly Details\n")
-            f.write("=" * 80 + "\n\n")
-            
-            for month in sorted_months:
-                data = monthly_data[month]
-                month_name = datetime.strptime(month, '%Y-%m').strftime('%B %Y')
-                f.write(f"\n{month_name}\n")
-                f.write("-" * len(month_name) + "\n")
-                
-                # Sort transactions by date for this month
-                sorted_transactions = sorted(data['transactions'], key=lambda x: x.date)
-                
-                trans_data = []
-                for trans in sorted_transactions:  # Use sorted transactions
-                    # Get subfolder name from transaction
-                    subfolder = getattr(trans, 'account_name', None)  # Try account_name first
-                    if not subfolder:
-                        subfolder = getattr(trans, 'account_id', 'Unknown')  # Fall back to account_id
-                    
-                    trans_data.append([
-                        trans.date.strftime('%d/%m/%Y'),
-                        f"£{trans.amount:,.2f}",
-                        trans.description,
-                        trans.type,
-                        subfolder,
-                        trans.transaction_id
-                    ])
-                
-                f.write(tabulate(
-                    trans_data,
-                    headers=['Date', 'Amount', 'Description', 'Type', 'Account', 'Transaction ID'],
-                    tablefmt='grid',
-                    stralign='right'
-                ))
-                f.write("\n")
+            parts.append("\n")
+        
+        output_file.write_text(''.join(parts))
         
         print(f"Report written to {output_file}")
 
@@ -174,8 +184,13 @@ def main():
         print("No statements found")
         return
     
+    # Find recurring charges and credit card interest once, then hand both to the report
+    recurring_charges = RC_Tracker().track_recurring_charges(statements_by_folder)
+    interest_charges = CreditCardBalance().find_interest_charges(statements_by_folder)
+    
     # Generate other payments report
-    other_payments = OtherPayments(statements_by_folder)
+    other_payments = OtherPayments(statements_by_folder, recurring_charges=recurring_charges,
+                                   interest_charges=interest_charges)
     other_payments.get_unmatched_transactions()
     other_payments.generate_report()
 
@@ -1,14 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
+import io
+import os
+import sys
 from parsers.barclays_parser import BarclaysOFXParser, BarclaysStatement
 from parsers.barclaycard_parser import BarclaycardOFXParser, CreditCardStatement
 from rename_data_files import rename_data_files
 from parsers.qif_parser import QIFParser, QIFStatement
 from parsers.pdf_parser import JohnLewisPDFParser, PDFStatement
 from parsers.nationwide_parser import NationwideXMLParser, NationwideStatement
-from typing import Dict, List, Union, Any
+from parsers.ledger import add_ledger_keys
+from typing import Dict, List, Tuple, Union, Any
 from parsers.virgin_parser import VirginCSVParser, VirginStatement
 
 
+# Parser for each folder name fragment, checked in order
+_PARSER_MAP = [
+    ('virgin', VirginCSVParser),
+    ('barclaycard', BarclaycardOFXParser),
+    ('barclays', BarclaysOFXParser),
+    ('nationwide', NationwideXMLParser),
+    ('mbna', QIFParser),
+    ('halifax', QIFParser),
+    ('johnlewis', JohnLewisPDFParser),
+]
+
+def _parse_folder(parser: Any) -> Tuple[List[Any], List[str], str]:
+    """
+    Parse one account folder in a worker process
+    
+    Ledger keys found missing are returned rather than written, so only the
+    parent process writes the shared ledger file.
+    
+    Returns:
+        The folder's statements, its missing ledger keys and anything it printed
+    """
+    parser.defer_ledger_writes = True
+    output = io.StringIO()
+    with redirect_stdout(output):
+        statements = parser.parse_all_statements()
+    return statements, list(parser.missing_ledger_keys), output.getvalue()
+
 def parse_all_account_folders(base_path: Path) -> Dict[str, List[Union[BarclaysStatement, CreditCardStatement, QIFStatement, PDFStatement, NationwideStatement, VirginStatement]]]:
     """
     Parse all account folders and return their statements
@@ -25,29 +58,42 @@ def parse_all_account_folders(base_path: Path) -> Dict[str, List[Union[BarclaysS
     
     rename_data_files(base_path)
     
-    # Process all subfolders
+    # Choose a parser for each subfolder
     statements_by_folder = {}
     subfolders = [f.name for f in base_path.iterdir() if f.is_dir()]
+    folder_parsers = []
     
     for subfolder in subfolders:
         # Choose appropriate parser based on folder name
-        if 'virgin' in subfolder.lower():
-            parser = VirginCSVParser(base_path=str(base_path), subfolder=subfolder)
-        elif 'barclaycard' in subfolder.lower():
-            parser = BarclaycardOFXParser(base_path=str(base_path), subfolder=subfolder)
-        elif 'barclays' in subfolder.lower():
-            parser = BarclaysOFXParser(base_path=str(base_path), subfolder=subfolder)
-        elif 'nationwide' in subfolder.lower():
-            parser = NationwideXMLParser(base_path=str(base_path), subfolder=subfolder)
-        elif any(name in subfolder.lower() for name in ['mbna', 'halifax']):
-            parser = QIFParser(base_path=str(base_path), subfolder=subfolder)
-        elif 'johnlewis' in subfolder.lower():
-            parser = JohnLewisPDFParser(base_path=str(base_path), subfolder=subfolder)
-        else:
+        folder_name = subfolder.lower()
+        parser = next(
+            (parser_class(base_path=str(base_path), subfolder=subfolder)
+             for name, parser_class in _PARSER_MAP if name in folder_name),
+            None
+        )
+        folder_parsers.append((subfolder, parser))
+    
+    # Parse folders in worker processes when there is more than one, then
+    # print their output and write missing ledger keys in folder order
+    parsers = [parser for _, parser in folder_parsers if parser]
+    if len(parsers) > 1:
+        with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(parsers))) as executor:
+            results = iter(list(executor.map(_parse_folder, parsers)))
+    else:
+        results = None
+    
+    for subfolder, parser in folder_parsers:
+        if parser is None:
             print(f"Skipping unknown folder: {subfolder}")
             continue
         
-        statements = parser.parse_all_statements()
+        if results is None:
+            statements = parser.parse_all_statements()
+        else:
+            statements, missing_ledger_keys, output = next(results)
+            print(output, end='')
+            if missing_ledger_keys:
+                add_ledger_keys(parser.ledger_amounts_file, missing_ledger_keys)
         if statements:
             statements_by_folder[subfolder] = statements
     
@@ -63,31 +109,31 @@ def main():
 
 def process_folder_statements(statements: List[Any], subfolder: str) -> None:
     """Print statements for a folder"""
-    print(f"\n=== Processing {subfolder} ===")
-    
     if not statements:
+        print(f"\n=== Processing {subfolder} ===")
         print(f"No statements found in {subfolder}")
         return
     
+    lines = [f"\n=== Processing {subfolder} ==="]
     for statement in statements:
-        print(f"\nStatement for account {statement.account_id if hasattr(statement, 'account_id') else statement.account_name}")
-        print(f"Statement end date: {statement.end_date}")
-        print(f"Statement start date: {statement.start_date}")
+        lines.append(f"\nStatement for account {statement.account_id if hasattr(statement, 'account_id') else statement.account_name}")
+        lines.append(f"Statement end date: {statement.end_date}")
+        lines.append(f"Statement start date: {statement.start_date}")
         
         # Handle different statement types
         if hasattr(statement, 'credit_limit'):
             # Credit card statement
             if statement.credit_limit:
-                print(f"Credit limit: £{statement.credit_limit:.2f}")
-            print(f"Current balance: £{statement.current_balance:.2f}")
+                lines.append(f"Credit limit: £{statement.credit_limit:.2f}")
+            lines.append(f"Current balance: £{statement.current_balance:.2f}")
             if statement.available_credit:
-                print(f"Available credit: £{statement.available_credit:.2f}")
+                lines.append(f"Available credit: £{statement.available_credit:.2f}")
         elif hasattr(statement, 'start_balance'):
             # Bank account statement
-            print(f"Opening balance: £{statement.start_balance:.2f}")
-            print(f"Closing balance: £{statement.end_balance:.2f}")
+            lines.append(f"Opening balance: £{statement.start_balance:.2f}")
+            lines.append(f"Closing balance: £{statement.end_balance:.2f}")
         
-        print("\nTransactions:")
+        lines.append("\nTransactions:")
         for trans in statement.transactions:
             # Format transaction details
             if hasattr(trans, 'post_date') and trans.post_date != trans.date:
@@ -102,7 +148,10 @@ def process_folder_statements(statements: List[Any], subfolder: str) -> None:
             else:
                 category = ""
                 
-            print(f"\n{trans.date.date()} {post_date} | {trans.type:<6} | £{trans.amount:>10.2f} | {trans.description} {category}")
+            lines.append(f"\n{trans.date.date()} {post_date} | {trans.type:<6} | £{trans.amount:>10.2f} | {trans.description} {category}")
+    
+    # Write the folder's output in one call
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 if __name__ == "__main__":
     main()
@@ -1,14 +1,26 @@
 from parsers.ofx_parser import OFXParser
+from parsers.scan_cache import NOT_SCANNED
+from parsers.running_totals import set_running_totals
+from parsers.statement_files import list_statement_files
+from parsers.transaction_ids import date_id_bytes, id_hasher
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 import re
-import configparser
-import hashlib
 
-@dataclass
+# Common Barclaycard description prefixes
+_PREFIX_RE = re.compile(r'^(?:PAYMENT|PURCHASE|CASH|CREDIT)\s*')
+
+# Statement-level fields, captured as (tag, value) pairs in a single scan of the file
+_STATEMENT_FIELDS_RE = re.compile(r'<(ACCTID|BALAMT|CREDITLIMIT|AVAILBAL)>([^<]+)')
+
+# Transaction fields, captured as (tag, value) pairs in a single scan
+_TRANSACTION_FIELDS_RE = re.compile(r'<(TRNTYPE|DTPOSTED|DTUSER|TRNAMT|FITID|NAME|MEMO|REFNUM|SIC)>([^<]+)')
+
+@dataclass(slots=True)
 class CreditCardTransaction:
     """Represents a credit card transaction"""
     transaction_id: str
@@ -22,7 +34,7 @@ class CreditCardTransaction:
     merchant_category: Optional[str] = None
     running_total: Optional[Decimal] = None
 
-@dataclass
+@dataclass(slots=True)
 class CreditCardStatement:
     """Represents a credit card statement"""
     account_id: str
@@ -43,58 +55,42 @@ class BarclaycardOFXParser(OFXParser):
     
     def _read_ledger_amount(self, start_date: datetime) -> Optional[Decimal]:
         """Read the ledger amount from the properties file"""
-        config = configparser.ConfigParser()
-        config.read(self.ledger_amounts_file)
-
         # Create the key using subfolder name and statement start date
         key = f"{self.subfolder}|{start_date.strftime('%Y-%m-%d')}"
+        value = self._ledger_value(key)
         
-        if 'LedgerAmounts' not in config:
-            config['LedgerAmounts'] = {}
-
-        if key in config['LedgerAmounts']:
-            return Decimal(config['LedgerAmounts'][key])
+        if value is not None:
+            return Decimal(value)
         else:
             # If the key is absent, add it as an empty property
-            config['LedgerAmounts'][key] = ''
-            with open(self.ledger_amounts_file, 'w') as configfile:
-                config.write(configfile)
+            self._add_missing_ledger_key(key)
             return None  # Return None if the key was absent
     
     def _clean_description(self, desc: str) -> str:
         """Clean up transaction description"""
         desc = super()._clean_description(desc)
         # Remove common Barclaycard prefixes
-        desc = re.sub(r'^(PAYMENT|PURCHASE|CASH|CREDIT|)\s*', '', desc)
+        desc = _PREFIX_RE.sub('', desc, count=1)
         return desc.strip()
     
-    def _parse_date(self, date_str: str) -> datetime:
-        """Parse OFX date format (YYYYMMDDHHMMSS) to datetime"""
-        return datetime.strptime(date_str[:8], '%Y%m%d')
-    
     def _parse_amount(self, amount_str: str) -> Decimal:
         """Parse amount string to Decimal"""
         return Decimal(amount_str.strip())
     
-    def _extract_tag_value(self, content: str, tag: str) -> Optional[str]:
-        """Extract value between OFX tags"""
-        pattern = f"<{tag}>([^<]+)"
-        match = re.search(pattern, content)
-        return match.group(1) if match else None
-    
     def _parse_transaction_block(self, trans_block: str) -> Optional[CreditCardTransaction]:
         """Parse a transaction block into a CreditCardTransaction object"""
         try:
             # Extract and clean all fields
-            trntype = (self._extract_tag_value(trans_block, 'TRNTYPE') or '').strip()
-            date_str = (self._extract_tag_value(trans_block, 'DTPOSTED') or '').strip()
-            trans_date_str = (self._extract_tag_value(trans_block, 'DTUSER') or '').strip()
-            amount_str = (self._extract_tag_value(trans_block, 'TRNAMT') or '').strip()
-            fitid = (self._extract_tag_value(trans_block, 'FITID') or '').strip()
-            name = (self._extract_tag_value(trans_block, 'NAME') or '').strip()
-            memo = (self._extract_tag_value(trans_block, 'MEMO') or '').strip()
-            ref = (self._extract_tag_value(trans_block, 'REFNUM') or '').strip()
-            category = (self._extract_tag_value(trans_block, 'SIC') or '').strip()
+            fields = self._extract_tag_values(trans_block, _TRANSACTION_FIELDS_RE)
+            trntype = fields.get('TRNTYPE', '').strip()
+            date_str = fields.get('DTPOSTED', '').strip()
+            trans_date_str = fields.get('DTUSER', '').strip()
+            amount_str = fields.get('TRNAMT', '').strip()
+            fitid = fields.get('FITID', '').strip()
+            name = fields.get('NAME', '').strip()
+            memo = fields.get('MEMO', '').strip()
+            ref = fields.get('REFNUM', '').strip()
+            category = fields.get('SIC', '').strip()
             
             if not all([trntype, date_str, amount_str, fitid]):
                 return None
@@ -125,32 +121,55 @@ class BarclaycardOFXParser(OFXParser):
             print(f"Error parsing transaction block: {str(e)}")
             return None
     
-    def _parse_ofx_file(self, file_path: Path) -> Optional[CreditCardStatement]:
-        """Parse an OFX file and return a CreditCardStatement object"""
-        try:
-            with open(file_path, 'r', encoding='iso-8859-1') as file:
-                content = file.read()
-                
-            # Get account info
-            acctid = self._extract_tag_value(content, 'ACCTID')
-            if not acctid:
-                return None
-            
-            # Get balance
-            ledger_bal = self._parse_amount(self._extract_tag_value(content, 'BALAMT'))
-            
-            # Extract all transaction blocks
-            trans_blocks = re.findall(r'<STMTTRN>(.*?)</STMTTRN>', content, re.DOTALL)
+    def _scan_ofx_file(self, file_path: Path) -> Optional[Tuple[str, List[CreditCardTransaction], Optional[str], Optional[str]]]:
+        """
+        Read an OFX file's account, transactions and credit figures, leaving the
+        ledger lookup to _parse_ofx_file
+        
+        Returns:
+            (account id, transactions sorted by date, credit limit, available credit),
+            or None if the file has no account
+        """
+        content, blocks = self._read_ofx_blocks(file_path, 'iso-8859-1')
             
-            # Parse transactions
-            transactions = []
-            for trans_block in trans_blocks:
-                transaction = self._parse_transaction_block(trans_block)
-                if transaction:
-                    transactions.append(transaction)
+        # Get account info, balance and credit figures
+        statement_fields = self._extract_tag_values(content, _STATEMENT_FIELDS_RE)
+        acctid = statement_fields.get('ACCTID')
+        if not acctid:
+            return None
+        
+        # Get balance
+        ledger_bal = self._parse_amount(statement_fields.get('BALAMT'))
+        
+        # Parse the transaction blocks, skipping any that fail
+        transactions = list(filter(None, map(self._parse_transaction_block, blocks)))
+
+        # sort transations by increasing date
+        transactions.sort(key=attrgetter('date'))
 
-            # sort transations by increasing date
-            transactions.sort(key=lambda x: x.date)
+        return (
+            acctid,
+            transactions,
+            statement_fields.get('CREDITLIMIT'),
+            statement_fields.get('AVAILBAL'),
+        )
+    
+    def _parse_ofx_file(self, file_path: Path, scanned: Any = NOT_SCANNED) -> Optional[CreditCardStatement]:
+        """
+        Parse an OFX file and return a CreditCardStatement object
+        
+        Args:
+            file_path: OFX file to parse
+            scanned: Result of _scan_ofx_file for this file if it was already scanned or read from the cache
+        """
+        try:
+            if scanned is NOT_SCANNED:
+                scanned = self._scan_ofx_file(file_path)
+            elif isinstance(scanned, Exception):
+                raise scanned
+            if scanned is None:
+                return None
+            acctid, transactions, credit_limit, available_credit = scanned
 
             dtstart = transactions[0].date
             dtend = transactions[-1].date
@@ -161,20 +180,17 @@ class BarclaycardOFXParser(OFXParser):
                 return None
 
             # set running total to ledger balance and updates all transactions with running total
-            running_total = ledger_bal
-            for transaction in transactions:
-                running_total += transaction.amount
-                transaction.running_total = running_total
+            set_running_totals(transactions, ledger_bal)
 
             
             return CreditCardStatement(
                 account_id=acctid,
                 start_date=dtstart,
                 end_date=dtend,
-                credit_limit=self._parse_amount(self._extract_tag_value(content, 'CREDITLIMIT')) if self._extract_tag_value(content, 'CREDITLIMIT') else None,
+                credit_limit=self._parse_amount(credit_limit) if credit_limit else None,
                 current_balance=ledger_bal,
-                available_credit=self._parse_amount(self._extract_tag_value(content, 'AVAILBAL')) if self._extract_tag_value(content, 'AVAILBAL') else None,
-                transactions=sorted(transactions, key=lambda x: x.date)
+                available_credit=self._parse_amount(available_credit) if available_credit else None,
+                transactions=transactions
             )
             
         except Exception as e:
@@ -190,23 +206,28 @@ class BarclaycardOFXParser(OFXParser):
             print(f"Barclaycard folder not found at {self.base_path}")
             return statements
         
-        # First collect all statements
-        for file_path in self.base_path.glob("*.ofx"):
-            statement = self._parse_ofx_file(file_path)
+        # First collect all statements, scanning the files first, then reading
+        # the ledger and printing in file order
+        file_paths = list_statement_files(self.base_path, ".ofx")
+        for file_path, (scanned, output) in zip(file_paths, self._scan_ofx_files(file_paths)):
+            print(output, end='')
+            statement = self._parse_ofx_file(file_path, scanned)
             if statement:
                 # Filter out transactions we've already seen
                 unique_transactions = []
                 for trans in statement.transactions:
-                    if trans.transaction_id not in seen_transactions:
-                        seen_transactions.add(trans.transaction_id)
-                        unique_transactions.append(trans)
+                    if trans.transaction_id in seen_transactions:
+                        continue
+                    seen_transactions.add(trans.transaction_id)
+                    unique_transactions.append(trans)
                 
                 # Update statement with unique transactions only
                 statement.transactions = unique_transactions
                 if unique_transactions:  # Only add statement if it has unique transactions
                     statements.append(statement)
         
-        return sorted(statements, key=lambda x: x.start_date)
+        self.flush_ledger()
+        return sorted(statements, key=attrgetter('start_date'))
     
     def _generate_transaction_id(self, date: datetime, amount: Decimal, description: str) -> str:
         """
@@ -220,16 +241,18 @@ class BarclaycardOFXParser(OFXParser):
         Returns:
             String hash uniquely identifying the transaction
         """
-        # Create a string combining key transaction attributes
+        # Create a string combining the remaining transaction attributes,
+        # hashed after the subfolder prefix (once per process) and the date
         id_string = (
-            f"{self.subfolder}|"
-            f"{date.strftime('%Y%m%d')}|"
             f"{abs(amount):.2f}|"
             f"{description}"
         )
         
-        # Generate SHA-256 hash and take first 12 characters
-        return hashlib.sha256(id_string.encode()).hexdigest()[:12]
+        # Generate SHA-256 hash and take the first 6 bytes as 12 hex characters
+        hasher = id_hasher(f"{self.subfolder}|").copy()
+        hasher.update(date_id_bytes(date))
+        hasher.update(id_string.encode())
+        return hasher.digest()[:6].hex()
 
 def main():
     base_path = Path("financial-data")
@@ -1,15 +1,24 @@
 import traceback
 from parsers.ofx_parser import OFXParser
+from parsers.scan_cache import NOT_SCANNED
+from parsers.running_totals import set_running_totals
+from parsers.statement_files import list_statement_files
+from parsers.transaction_ids import date_id_bytes, id_hasher
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
+from operator import attrgetter
 import re
-import hashlib
-import configparser
 
-@dataclass
+# Common Barclays description prefixes
+_PREFIX_RE = re.compile(r'^(?:BGC|BBP|CWP|TFR|DD|SO|DEB|CRD)\s*')
+
+# Transaction fields, captured as (tag, value) pairs in a single scan
+_TRANSACTION_FIELDS_RE = re.compile(r'<(TRNTYPE|DTPOSTED|TRNAMT|NAME|MEMO)>([^<]+)')
+
+@dataclass(slots=True)
 class BarclaysTransaction:
     """Represents a Barclays bank transaction"""
     transaction_id: str
@@ -20,7 +29,7 @@ class BarclaysTransaction:
     account_name: str
     running_total: Optional[Decimal] = None
 
-@dataclass
+@dataclass(slots=True)
 class BarclaysStatement:
     """Represents a Barclays bank statement"""
     account_id: str
@@ -34,7 +43,7 @@ class BarclaysOFXParser(OFXParser):
     """Parser for Barclays OFX files"""
     
     def __init__(self, base_path: str = "financial-data", subfolder: str = "barclays-current"):
-        self.base_path = Path(base_path) / subfolder
+        super().__init__(base_path, subfolder)
         self.subfolder = subfolder
         self.ledger_amounts_file = Path(base_path) / 'ledger_amounts.properties'
     
@@ -51,58 +60,54 @@ class BarclaysOFXParser(OFXParser):
         Returns:
             String hash uniquely identifying the transaction
         """
-        # Create a string combining key transaction attributes
+        # Create a string combining the remaining transaction attributes,
+        # hashed after the subfolder prefix (once per process) and the date
         id_string = (
-            f"{self.subfolder}|"
-            f"{date.strftime('%Y%m%d')}|"
             f"{amount:.2f}|"
             f"{description}|"
             f"{trans_type}"
         )
         
-        # Generate SHA-256 hash and take first 12 characters
-        return hashlib.sha256(id_string.encode()).hexdigest()[:12]
+        # Generate SHA-256 hash and take the first 6 bytes as 12 hex characters
+        hasher = id_hasher(f"{self.subfolder}|").copy()
+        hasher.update(date_id_bytes(date))
+        hasher.update(id_string.encode())
+        return hasher.digest()[:6].hex()
     
     def _read_ledger_amount(self, start_date: datetime) -> Optional[Decimal]:
         """Read the ledger amount from the properties file"""
-        config = configparser.ConfigParser()
-        config.read(self.ledger_amounts_file)
-
         # Create the key using subfolder name and statement start date
         key = f"{self.subfolder}|{start_date.strftime('%Y-%m-%d')}"
+        value = self._ledger_value(key)
         
-        if 'LedgerAmounts' not in config:
-            config['LedgerAmounts'] = {}
-
-        if key in config['LedgerAmounts']:
-            v = config['LedgerAmounts'][key].strip()
+        if value is not None:
+            v = value.strip()
             if v == '':
                 return Decimal(0)
             else:
                 return Decimal(v)
         else:
             # If the key is absent, add it as an empty property
-            config['LedgerAmounts'][key] = ''
-            with open(self.ledger_amounts_file, 'w') as configfile:
-                config.write(configfile)
+            self._add_missing_ledger_key(key)
             return None  # Return None if the key was absent
 
     def _clean_description(self, desc: str) -> str:
         """Clean up transaction description"""
         desc = super()._clean_description(desc)
         # Remove common Barclays prefixes
-        desc = re.sub(r'^(BGC|BBP|CWP|TFR|DD|SO|DEB|CRD|)\s*', '', desc)
+        desc = _PREFIX_RE.sub('', desc, count=1)
         return desc.strip()
     
     def _parse_transaction_block(self, trans_block: str) -> Optional[BarclaysTransaction]:
         """Parse a transaction block into a BarclaysTransaction object"""
         try:
             # Extract transaction details
-            trntype = self._extract_tag_value(trans_block, 'TRNTYPE')
-            date_str = self._extract_tag_value(trans_block, 'DTPOSTED')
-            amount_str = self._extract_tag_value(trans_block, 'TRNAMT')
-            name = self._extract_tag_value(trans_block, 'NAME')
-            memo = self._extract_tag_value(trans_block, 'MEMO')
+            fields = self._extract_tag_values(trans_block, _TRANSACTION_FIELDS_RE)
+            trntype = fields.get('TRNTYPE')
+            date_str = fields.get('DTPOSTED')
+            amount_str = fields.get('TRNAMT')
+            name = fields.get('NAME')
+            memo = fields.get('MEMO')
             
             if not all([trntype, date_str, amount_str]):
                 return None
@@ -136,53 +141,68 @@ class BarclaysOFXParser(OFXParser):
             print(f"Error parsing transaction block: {str(e)}")
             return None
     
-    def _parse_ofx_file(self, file_path: Path) -> Optional[BarclaysStatement]:
-        """Parse an OFX file and return a BarclaysStatement object"""
-        try:
-            with open(file_path, 'r', encoding='cp1252') as file:
-                content = file.read()
-                
-                # Get account info
-                acctid = self._extract_tag_value(content, 'ACCTID')
-                if not acctid:
-                    return None
-                
-                
-                # Extract all transaction blocks
-                trans_blocks = re.findall(r'<STMTTRN>(.*?)</STMTTRN>', content, re.DOTALL)
-                
-                # Parse transactions
-                transactions = []
-                for trans_block in trans_blocks:
-                    transaction = self._parse_transaction_block(trans_block)
-                    if transaction:
-                        transactions.append(transaction)
+    def _scan_ofx_file(self, file_path: Path) -> Optional[Tuple[str, List[BarclaysTransaction]]]:
+        """
+        Read an OFX file's account and transactions, leaving the ledger lookup
+        to _parse_ofx_file
+        
+        Returns:
+            (account id, transactions oldest first), or None if the file has no account
+        """
+        content, blocks = self._read_ofx_blocks(file_path, 'cp1252')
+            
+        # Get account info
+        acctid = self._extract_tag_value(content, 'ACCTID')
+        if not acctid:
+            return None
+        
+        
+        # Parse the transaction blocks, skipping any that fail
+        transactions = list(filter(None, map(self._parse_transaction_block, blocks)))
 
-                # reverse list so oldest first
-                transactions.reverse()
-                dtstart = transactions[0].date
-                dtend = transactions[-1].date
+        # reverse list so oldest first
+        transactions.reverse()
+        return acctid, transactions
+    
+    def _parse_ofx_file(self, file_path: Path, scanned: Any = NOT_SCANNED) -> Optional[BarclaysStatement]:
+        """
+        Parse an OFX file and return a BarclaysStatement object
+        
+        Args:
+            file_path: OFX file to parse
+            scanned: Result of _scan_ofx_file for this file if it was already scanned or read from the cache
+        """
+        try:
+            if scanned is NOT_SCANNED:
+                scanned = self._scan_ofx_file(file_path)
+            elif isinstance(scanned, Exception):
+                raise scanned
+            if scanned is None:
+                return None
+            acctid, transactions = scanned
+            dtstart = transactions[0].date
+            dtend = transactions[-1].date
 
-                # Read ledger amount from properties file
-                ledger_bal = self._read_ledger_amount(dtstart)
-                if ledger_bal is None:
-                    print(f"Ledger amount not found for key: {dtstart.strftime('%Y-%m-%d')} in {self.subfolder}.")
-                    return None
-                            # set running total to ledger balance and updates all transactions with running total
-                running_total = ledger_bal
-                for transaction in transactions:
-                    running_total += transaction.amount
-                    transaction.running_total = running_total                
+            # Read ledger amount from properties file
+            ledger_bal = self._read_ledger_amount(dtstart)
+            if ledger_bal is None:
+                print(f"Ledger amount not found for key: {dtstart.strftime('%Y-%m-%d')} in {self.subfolder}.")
+                return None
+            # set running total to ledger balance and updates all transactions with running total
+            running_total = set_running_totals(transactions, ledger_bal)
+            # running_total now exceeds the ledger balance by the sum of all amounts
 
+            # Sort in place; Timsort is linear on the already date-ordered lists
+            transactions.sort(key=attrgetter('date'))
 
-                return BarclaysStatement(
-                    account_id=acctid,
-                    start_date=dtstart,
-                    end_date=dtend,
-                    start_balance=ledger_bal - sum(t.amount for t in transactions),
-                    end_balance=ledger_bal,
-                    transactions=sorted(transactions, key=lambda x: x.date)
-                )
+            return BarclaysStatement(
+                account_id=acctid,
+                start_date=dtstart,
+                end_date=dtend,
+                start_balance=ledger_bal - (running_total - ledger_bal),
+                end_balance=ledger_bal,
+                transactions=transactions
+            )
                 
         except Exception as e:
             print(f"Error parsing file {file_path}: {str(e)}")
@@ -198,25 +218,30 @@ class BarclaysOFXParser(OFXParser):
             print(f"Barclays folder not found at {self.base_path}")
             return statements
         
-        # First collect all statements
-        for file_path in self.base_path.glob("*.ofx"):
-            statement = self._parse_ofx_file(file_path)
+        # First collect all statements, scanning the files first, then reading
+        # the ledger and printing in file order
+        file_paths = list_statement_files(self.base_path, ".ofx")
+        for file_path, (scanned, output) in zip(file_paths, self._scan_ofx_files(file_paths)):
+            print(output, end='')
+            statement = self._parse_ofx_file(file_path, scanned)
             if statement:
                 # Filter out transactions we've already seen
                 unique_transactions = []
                 for trans in statement.transactions:
-                    if trans.transaction_id not in seen_transactions:
-                        seen_transactions.add(trans.transaction_id)
-                        unique_transactions.append(trans)
+                    if trans.transaction_id in seen_transactions:
+                        continue
+                    seen_transactions.add(trans.transaction_id)
+                    unique_transactions.append(trans)
                 
                 # Update statement with unique transactions only
                 statement.transactions = unique_transactions
                                 
  
                 if unique_transactions:  # Only add statement if it has unique transactions
-                    # Calculate dtstart and dtend from transactions
-                    statement.start_date = min(t.date for t in unique_transactions)
-                    statement.end_date = max(t.date for t in unique_transactions)
+                    # Calculate dtstart and dtend from transactions, which stay in date order
+                    statement.start_date = unique_transactions[0].date
+                    statement.end_date = unique_transactions[-1].date
                     statements.append(statement)
         
-        return sorted(statements, key=lambda x: x.start_date) 
\ No newline at end of file
+        self.flush_ledger()
+        return sorted(statements, key=attrgetter('start_date')) 
\ No newline at end of file
@@ -0,0 +1,40 @@
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple
+import copy
+import json
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    """The (mtime_ns, size) of a file, used to tell whether it has changed"""
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+class FileCache:
+    """
+    Parsed files keyed on path, each re-parsed only when its (mtime_ns, size)
+    has changed since it was last parsed in this process
+
+    Callers get a copy made with the copy function, so changing what they are
+    handed never changes the cached parse.
+    """
+
+    def __init__(self, parse: Callable[[Path], Any], copy: Callable[[Any], Any]):
+        self._parse = parse
+        self._copy = copy
+        self._entries: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+
+    def get(self, path: Path) -> Any:
+        """Return a copy of the parsed file, raising FileNotFoundError if it is missing"""
+        signature = file_signature(path)
+        cached = self._entries.get(path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, self._parse(path))
+            self._entries[path] = cached
+        return self._copy(cached[1])
+
+    def put(self, path: Path, value: Any) -> None:
+        """Record value as the parse of the file as it is now, e.g. just after writing it"""
+        self._entries[path] = (file_signature(path), self._copy(value))
+
+# Parsed JSON config files; each load hands out a deep copy, so a config only
+# changes once the caller writes it back and records it with put
+JSON_FILES = FileCache(lambda path: json.loads(path.read_text()), copy=copy.deepcopy)
@@ -0,0 +1,127 @@
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+import re
+from parsers.file_cache import FileCache
+
+# Section holding the ledger amounts, keyed on subfolder|YYYY-MM-DD
+_LEDGER_SECTION = 'LedgerAmounts'
+
+# key = value or key: value, split on the first delimiter as configparser does
+_OPTION_RE = re.compile(r'(.*?)\s*[=:]\s*(.*)$')
+
+def _parse_ledger(text: str) -> Tuple[Dict[str, str], Optional[int], bool]:
+    """
+    Parse ledger properties text in a single pass over its lines
+
+    Returns:
+        The LedgerAmounts entries with lower-cased keys (as configparser reads
+        them), the line index just after the end of that section (None if it is
+        absent) and whether it is the last section in the file
+    """
+    amounts = {}
+    section = None
+    section_end = None
+    for index, line in enumerate(text.splitlines()):
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] == '[' and line[-1] == ']':
+            section = line[1:-1]
+            if section == _LEDGER_SECTION:
+                section_end = index + 1
+        elif section == _LEDGER_SECTION:
+            section_end = index + 1
+            match = _OPTION_RE.match(line) if line[0] not in '#;' else None
+            if match:
+                amounts[match.group(1).lower()] = match.group(2)
+    return amounts, section_end, section == _LEDGER_SECTION
+
+def _read_ledger_text(ledger_amounts_file: Path) -> str:
+    """Read the ledger properties file, treating a missing file as empty"""
+    try:
+        return ledger_amounts_file.read_text()
+    except FileNotFoundError:
+        return ''
+
+# Parsed ledger amounts per ledger file; callers add missing keys to their copy
+_LEDGER_CACHE = FileCache(lambda path: _parse_ledger(_read_ledger_text(path))[0], copy=dict)
+
+def load_ledger(ledger_amounts_file: Path) -> Dict[str, str]:
+    """
+    Load the ledger amounts from the properties file, re-parsing it only when
+    its mtime or size has changed since the last load in this process
+
+    Args:
+        ledger_amounts_file: Path to ledger_amounts.properties
+
+    Returns:
+        Dict mapping lower-cased ledger keys to their (possibly empty) values
+    """
+    try:
+        return _LEDGER_CACHE.get(ledger_amounts_file)
+    except FileNotFoundError:
+        return {}
+
+def add_ledger_keys(ledger_amounts_file: Path, keys: Iterable[str]) -> None:
+    """
+    Append keys absent from the ledger properties file as empty properties
+
+    The file is re-read first so keys added by other parsers are kept, and
+    existing lines are left exactly as they are.
+
+    Args:
+        ledger_amounts_file: Path to ledger_amounts.properties
+        keys: Ledger keys (subfolder|YYYY-MM-DD) to add
+    """
+    text = _read_ledger_text(ledger_amounts_file)
+    amounts, section_end, section_is_last = _parse_ledger(text)
+    new_keys = [key for key in dict.fromkeys(key.lower() for key in keys) if key not in amounts]
+    if not new_keys:
+        return
+    entries = [f"{key} = " for key in new_keys]
+
+    if section_end is not None and not section_is_last:
+        # Another section follows, so insert the entries at the end of ours
+        lines = text.splitlines()
+        lines[section_end:section_end] = entries
+        ledger_amounts_file.write_text('\n'.join(lines) + '\n')
+        return
+
+    lines = []
+    if text and not text.endswith('\n'):
+        lines.append('')
+    if section_end is None:
+        lines.append(f"[{_LEDGER_SECTION}]")
+    lines.extend(entries)
+    with open(ledger_amounts_file, 'a') as ledger_file:
+        ledger_file.write('\n'.join(lines) + '\n')
+
+class LedgerMixin:
+    """
+    Ledger amounts for a parser with a ledger_amounts_file, loaded on first use
+
+    Keys missing from the ledger are recorded in missing_ledger_keys and written
+    by flush_ledger, unless defer_ledger_writes is set and the caller writes them.
+    """
+    _ledger_amounts = None
+    missing_ledger_keys = ()
+    defer_ledger_writes = False
+
+    def _ledger_value(self, key: str) -> Optional[str]:
+        """Return the ledger value for a key, or None if the key is absent"""
+        if self._ledger_amounts is None:
+            self._ledger_amounts = load_ledger(self.ledger_amounts_file)
+            self.missing_ledger_keys = []
+        return self._ledger_amounts.get(key.lower())
+
+    def _add_missing_ledger_key(self, key: str) -> None:
+        """Add an absent ledger key as an empty property, written out by flush_ledger"""
+        if self._ledger_value(key) is None:
+            self._ledger_amounts[key.lower()] = ''
+            self.missing_ledger_keys.append(key)
+
+    def flush_ledger(self) -> None:
+        """Append any missing keys to the ledger properties file"""
+        if self.missing_ledger_keys and not self.defer_ledger_writes:
+            add_ledger_keys(self.ledger_amounts_file, self.missing_ledger_keys)
+            self.missing_ledger_keys = []
@@ -1,14 +1,17 @@
 from parsers.ofx_parser import OFXParser
+from parsers.scan_cache import NOT_SCANNED
+from parsers.running_totals import set_running_totals
+from parsers.statement_files import list_statement_files
+from parsers.transaction_ids import date_id_bytes, id_hasher
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 import xml.etree.ElementTree as ET
-import configparser
-import hashlib
 
-@dataclass
+@dataclass(slots=True)
 class NationwideTransaction:
     """Represents a Nationwide bank transaction"""
     transaction_id: str
@@ -20,7 +23,7 @@ class NationwideTransaction:
     balance_after: Optional[Decimal] = None
     reference: Optional[str] = None
     running_total: Optional[Decimal] = None
-@dataclass
+@dataclass(slots=True)
 class NationwideStatement:
     """Represents a Nationwide bank statement"""
     account_id: str
@@ -40,52 +43,57 @@ class NationwideXMLParser(OFXParser):
     
     def _read_ledger_amount(self, start_date: datetime) -> Optional[Decimal]:
         """Read the ledger amount from the properties file"""
-        config = configparser.ConfigParser()
-        config.read(self.ledger_amounts_file)
-
         # Create the key using subfolder name and statement start date
         key = f"{self.subfolder}|{start_date.strftime('%Y-%m-%d')}"
+        value = self._ledger_value(key)
         
-        if 'LedgerAmounts' not in config:
-            config['LedgerAmounts'] = {}
-
-        if key in config['LedgerAmounts']:
-            return Decimal(config['LedgerAmounts'][key])
+        if value is not None:
+            return Decimal(value)
         else:
             # If the key is absent, add it as an empty property
-            config['LedgerAmounts'][key] = ''
-            with open(self.ledger_amounts_file, 'w') as configfile:
-                config.write(configfile)
+            self._add_missing_ledger_key(key)
             return None  # Return None if the key was absent
 
+    def _find_field(self, trans_elem: ET.Element, tag: str) -> Optional[ET.Element]:
+        """Find a transaction field, trying direct children before a descendant search"""
+        field = trans_elem.find(tag)
+        return field if field is not None else trans_elem.find(f'.//{tag}')
+
+    def _field_text(self, trans_elem: ET.Element, tag: str) -> Optional[str]:
+        """Return a transaction field's stripped text, or None if the field is missing or empty"""
+        field = self._find_field(trans_elem, tag)
+        if field is None or field.text is None:
+            return None
+        return field.text.strip()
+
     def _parse_transaction_element(self, trans_elem: ET.Element) -> Optional[NationwideTransaction]:
         """Parse a transaction XML element"""
+        trntype = self._field_text(trans_elem, 'TRNTYPE')
+        date_str = self._field_text(trans_elem, 'DTPOSTED')
+        amount_str = self._field_text(trans_elem, 'TRNAMT')
+        if trntype is None or date_str is None or amount_str is None or self._field_text(trans_elem, 'FITID') is None:
+            print("Error parsing transaction element: missing TRNTYPE, DTPOSTED, TRNAMT or FITID")
+            return None
+        
+        # Get description from NAME and MEMO
+        description = ' '.join(filter(None, [
+            self._field_text(trans_elem, 'NAME'),
+            self._field_text(trans_elem, 'MEMO')
+        ]))
+        
         try:
-            trntype = trans_elem.find('.//TRNTYPE').text.strip()
-            date_str = trans_elem.find('.//DTPOSTED').text.strip()
-            amount_str = trans_elem.find('.//TRNAMT').text.strip()
-            fitid = trans_elem.find('.//FITID').text.strip()
-            
-            # Get description from NAME and MEMO
-            name = trans_elem.find('.//NAME')
-            memo = trans_elem.find('.//MEMO')
-            description = ' '.join(filter(None, [
-                name.text.strip() if name is not None else None,
-                memo.text.strip() if memo is not None else None
-            ]))
+            date = self._parse_date(date_str)
+            amount = self._parse_amount(amount_str)
+            description = self._clean_description(description)
             
             # Generate transaction ID
-            trans_id = self._generate_transaction_id(
-                self._parse_date(date_str),
-                self._parse_amount(amount_str),
-                self._clean_description(description)
-            )
+            trans_id = self._generate_transaction_id(date, amount, description)
             
             return NationwideTransaction(
                 transaction_id=trans_id,
-                date=self._parse_date(date_str),
-                amount=self._parse_amount(amount_str),
-                description=self._clean_description(description),
+                date=date,
+                amount=amount,
+                description=description,
                 type=trntype,
                 account_name=self.base_path.name
             )
@@ -93,27 +101,57 @@ class NationwideXMLParser(OFXParser):
             print(f"Error parsing transaction element: {str(e)}")
             return None
     
-    def _parse_ofx_file(self, file_path: Path) -> Optional[NationwideStatement]:
-        """Parse an XML-format OFX file"""
+    def _scan_ofx_file(self, file_path: Path) -> Optional[Tuple[str, List[NationwideTransaction]]]:
+        """
+        Stream an XML-format OFX file's account and transactions, leaving the
+        ledger lookup to _parse_ofx_file
+        
+        Returns:
+            (account id, transactions), or None if the file has no statement section
+        """
+        # Stream the first statement transaction section, clearing each
+        # transaction element once parsed
+        acctid_elem = None
+        transactions = []
+        in_stmtrs = found_stmtrs = False
+        for event, elem in ET.iterparse(file_path, events=('start', 'end')):
+            if elem.tag == 'STMTRS':
+                if event == 'start' and not found_stmtrs:
+                    in_stmtrs = found_stmtrs = True
+                elif event == 'end':
+                    in_stmtrs = False
+            elif in_stmtrs and event == 'end':
+                if elem.tag == 'ACCTID':
+                    if acctid_elem is None:
+                        acctid_elem = elem
+                elif elem.tag == 'STMTTRN':
+                    transaction = self._parse_transaction_element(elem)
+                    if transaction:
+                        transactions.append(transaction)
+                    elem.clear()
+        
+        if not found_stmtrs:
+            return None
+        
+        # Get account info
+        return acctid_elem.text.strip(), transactions
+    
+    def _parse_ofx_file(self, file_path: Path, scanned: Any = NOT_SCANNED) -> Optional[NationwideStatement]:
+        """
+        Parse an XML-format OFX file
+        
+        Args:
+            file_path: OFX file to parse
+            scanned: Result of _scan_ofx_file for this file if it was already scanned or read from the cache
+        """
         try:
-            tree = ET.parse(file_path)
-            root = tree.getroot()
-            
-            # Get statement transaction section
-            stmtrs = root.find('.//STMTRS')
-            if stmtrs is None:
+            if scanned is NOT_SCANNED:
+                scanned = self._scan_ofx_file(file_path)
+            elif isinstance(scanned, Exception):
+                raise scanned
+            if scanned is None:
                 return None
-            
-            # Get account info
-            acctid = stmtrs.find('.//ACCTID').text.strip()
-            
-                        
-            # Parse transactions
-            transactions = []
-            for trans_elem in stmtrs.findall('.//STMTTRN'):
-                transaction = self._parse_transaction_element(trans_elem)
-                if transaction:
-                    transactions.append(transaction)
+            acctid, transactions = scanned
 
             # Get statement period
             dtstart = transactions[0].date
@@ -124,18 +162,16 @@ class NationwideXMLParser(OFXParser):
                 print(f"Ledger amount not found for key: {dtstart.strftime('%Y-%m-%d')} in {self.subfolder}.")
                 return None
             
-            running_total = ledger_bal
-            for t in transactions:
-                running_total += t.amount
-                t.running_total = running_total
+            running_total = set_running_totals(transactions, ledger_bal)
+            # running_total now exceeds the ledger balance by the sum of all amounts
             
             return NationwideStatement(
                 account_id=acctid,
                 start_date=dtstart,
                 end_date=dtend,
-                start_balance=ledger_bal - sum(t.amount for t in transactions),
+                start_balance=ledger_bal - (running_total - ledger_bal),
                 end_balance=ledger_bal,
-                transactions=sorted(transactions, key=lambda x: x.date)
+                transactions=sorted(transactions, key=attrgetter('date'))
             )
             
         except Exception as e:
@@ -151,20 +187,25 @@ class NationwideXMLParser(OFXParser):
             print(f"Nationwide folder not found at {self.base_path}")
             return statements
         
-        for file_path in self.base_path.glob("*.ofx"):
-            statement = self._parse_ofx_file(file_path)
+        # Scan the files first, then read the ledger and print in file order
+        file_paths = list_statement_files(self.base_path, ".ofx")
+        for file_path, (scanned, output) in zip(file_paths, self._scan_ofx_files(file_paths)):
+            print(output, end='')
+            statement = self._parse_ofx_file(file_path, scanned)
             if statement:
                 unique_transactions = []
                 for trans in statement.transactions:
-                    if trans.transaction_id not in seen_transactions:
-                        seen_transactions.add(trans.transaction_id)
-                        unique_transactions.append(trans)
+                    if trans.transaction_id in seen_transactions:
+                        continue
+                    seen_transactions.add(trans.transaction_id)
+                    unique_transactions.append(trans)
                 
                 statement.transactions = unique_transactions
                 if unique_transactions:
                     statements.append(statement)
         
-        return sorted(statements, key=lambda x: x.start_date) 
+        self.flush_ledger()
+        return sorted(statements, key=attrgetter('start_date')) 
     
     def _generate_transaction_id(self, date: datetime, amount: Decimal, description: str) -> str:
         """
@@ -178,13 +219,15 @@ class NationwideXMLParser(OFXParser):
         Returns:
             String hash uniquely identifying the transaction
         """
-        # Create a string combining key transaction attributes
+        # Create a string combining the remaining transaction attributes,
+        # hashed after the subfolder prefix (once per process) and the date
         id_string = (
-            f"{self.subfolder}|"
-            f"{date.strftime('%Y%m%d')}|"
             f"{abs(amount):.2f}|"
             f"{description}"
         )
         
-        # Generate SHA-256 hash and take first 12 characters
-        return hashlib.sha256(id_string.encode()).hexdigest()[:12] 
\ No newline at end of file
+        # Generate SHA-256 hash and take the first 6 bytes as 12 hex characters
+        hasher = id_hasher(f"{self.subfolder}|").copy()
+        hasher.update(date_id_bytes(date))
+        hasher.update(id_string.encode())
+        return hasher.digest()[:6].hex()
\ No newline at end of file
@@ -2,10 +2,30 @@ from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+from parsers.ledger import LedgerMixin
+from parsers.scan_cache import NOT_SCANNED, scan_files_cached
+import mmap
+import os
 import re
 
-class OFXParser:
+# Per-folder cache of scanned OFX files, keyed on file name and checked
+# against each file's mtime and size; bump the version when scans change
+_SCAN_CACHE_NAME = 'ofx_scan_cache.pkl'
+_SCAN_CACHE_VERSION = 2
+
+@lru_cache(maxsize=None)
+def _tag_pattern(tag: str) -> re.Pattern:
+    """Compile the value pattern for an OFX tag once"""
+    return re.compile(f"<{tag}>([^<]+)")
+
+@lru_cache(maxsize=4096)
+def _parse_ofx_date(date_str: str) -> datetime:
+    """Parse a YYYYMMDD date by slicing, as dates repeat across transactions"""
+    return datetime(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+
+class OFXParser(LedgerMixin):
     """Base parser for OFX files"""
     
     def __init__(self, base_path: str = "financial-data", subfolder: str = ""):
@@ -26,14 +46,86 @@ class OFXParser:
     
     def _parse_date(self, date_str: str) -> datetime:
         """Parse OFX date format (YYYYMMDDHHMMSS) to datetime"""
-        return datetime.strptime(date_str[:8], '%Y%m%d')
+        return _parse_ofx_date(date_str[:8])
     
     def _parse_amount(self, amount_str: str) -> Decimal:
         """Parse amount string to Decimal"""
         return Decimal(amount_str.strip())
     
+    def _decode_ofx(self, data: bytes, encoding: str) -> str:
+        """Decode OFX bytes, translating newlines as text mode would"""
+        content = data.decode(encoding)
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
+    
+    def _read_ofx_blocks(self, file_path: Path, encoding: str) -> Tuple[str, List[str]]:
+        """
+        Read an OFX file through a memory map, decoding the body of each
+        <STMTTRN> block separately from the statement text around them rather
+        than decoding and then slicing a copy of the whole file
+        
+        Args:
+            file_path: OFX file to read
+            encoding: Text encoding of the file
+            
+        Returns:
+            (statement text outside the transaction blocks, block bodies in order)
+        """
+        start_tag, end_tag = b'<STMTTRN>', b'</STMTTRN>'
+        statement_parts = []
+        blocks = []
+        with open(file_path, 'rb') as ofx_file:
+            if os.fstat(ofx_file.fileno()).st_size == 0:
+                return '', blocks
+            with mmap.mmap(ofx_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                pos = 0
+                while True:
+                    start = mapped.find(start_tag, pos)
+                    if start == -1:
+                        break
+                    start += len(start_tag)
+                    end = mapped.find(end_tag, start)
+                    if end == -1:
+                        break
+                    statement_parts.append(self._decode_ofx(mapped[pos:start], encoding))
+                    blocks.append(self._decode_ofx(mapped[start:end], encoding))
+                    pos = end
+                statement_parts.append(self._decode_ofx(mapped[pos:], encoding))
+        return ''.join(statement_parts), blocks
+    
     def _extract_tag_value(self, content: str, tag: str) -> Optional[str]:
         """Extract value between OFX tags"""
-        pattern = f"<{tag}>([^<]+)"
-        match = re.search(pattern, content)
-        return match.group(1) if match else None 
\ No newline at end of file
+        match = _tag_pattern(tag).search(content)
+        return match.group(1) if match else None 
+    
+    def _extract_tag_values(self, content: str, fields_pattern: re.Pattern) -> Dict[str, str]:
+        """
+        Extract the values of several OFX tags in one scan
+        
+        Args:
+            content: OFX content to scan
+            fields_pattern: Compiled pattern capturing (tag, value) pairs
+            
+        Returns:
+            Dict mapping each tag found to its first value, as _extract_tag_value would return
+        """
+        values = {}
+        for tag, value in fields_pattern.findall(content):
+            values.setdefault(tag, value)
+        return values
+    
+    def _scan_ofx_files(self, file_paths: List[Path]) -> List[Tuple[Any, str]]:
+        """
+        Scan OFX files, reusing cached scans of unchanged files. Ledger lookups
+        are left to the caller, so the ledger file is only ever read and
+        written by one process.
+        
+        Args:
+            file_paths: OFX files to scan
+            
+        Returns:
+            (scanned, output) per file in the order given
+        """
+        return scan_files_cached(self, self._scan_ofx_file, file_paths,
+                                 _SCAN_CACHE_NAME, _SCAN_CACHE_VERSION)
@@ -1,14 +1,36 @@
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Optional
+from parsers.ledger import LedgerMixin
+from parsers.running_totals import set_running_totals
+from parsers.statement_files import list_statement_files
+from parsers.scan_cache import NOT_SCANNED, scan_files_cached
+from parsers.transaction_ids import date_id_bytes, id_hasher
+from typing import Any, List, Optional, Tuple
 import pdfplumber
 import re
-import hashlib
-import configparser
 
-@dataclass
+# Transaction line: date, description, sign and amount, matched across a
+# page's extracted text so each match is one whole line
+_TRANSACTION_LINE_RE = re.compile(r'^[ \t]*(\d{2} \w{3} \d{4}) (.*) ([+-]) £(\d+\.\d+)', re.MULTILINE)
+
+# Currency symbols and thousands separators stripped from amounts
+_AMOUNT_CLEAN_RE = re.compile(r'[£$,]')
+
+# Per-folder cache of extracted PDF transactions, keyed on file name and
+# checked against each file's mtime and size; bump the version when scans change
+_SCAN_CACHE_NAME = 'pdf_scan_cache.pkl'
+_SCAN_CACHE_VERSION = 1
+
+@lru_cache(maxsize=4096)
+def _parse_statement_date(date_str: str) -> datetime:
+    """Parse a DD MMM YYYY date once, as dates repeat across transactions"""
+    return datetime.strptime(date_str, '%d %b %Y')
+
+@dataclass(slots=True)
 class PDFTransaction:
     """Represents a transaction from a PDF statement"""
     transaction_id: str
@@ -19,7 +41,7 @@ class PDFTransaction:
     account_name: str
     reference: Optional[str] = None
     running_total: Optional[Decimal] = None
-@dataclass
+@dataclass(slots=True)
 class PDFStatement:
     """Represents a PDF statement"""
     account_name: str
@@ -30,7 +52,7 @@ class PDFStatement:
     transactions: List[PDFTransaction]
     ledger_balance: Optional[Decimal] = None
 
-class JohnLewisPDFParser:
+class JohnLewisPDFParser(LedgerMixin):
     """Parser for John Lewis PDF statements"""
     
     def __init__(self, base_path: str = "financial-data", subfolder: str = "johnlewis"):
@@ -40,33 +62,26 @@ class JohnLewisPDFParser:
     
     def _read_ledger_amount(self, start_date: datetime) -> Optional[Decimal]:
         """Read the ledger amount from the properties file"""
-        config = configparser.ConfigParser()
-        config.read(self.ledger_amounts_file)
-
         # Create the key using subfolder name and statement start date
         key = f"{self.subfolder}|{start_date.strftime('%Y-%m-%d')}"
+        value = self._ledger_value(key)
         
-        if 'LedgerAmounts' not in config:
-            config['LedgerAmounts'] = {}
-
-        if key in config['LedgerAmounts']:
-            return Decimal(config['LedgerAmounts'][key])
+        if value is not None:
+            return Decimal(value)
         else:
             # If the key is absent, add it as an empty property
-            config['LedgerAmounts'][key] = ''
-            with open(self.ledger_amounts_file, 'w') as configfile:
-                config.write(configfile)
+            self._add_missing_ledger_key(key)
             return None  # Return None if the key was absent
     
     def _parse_amount(self, amount_str: str) -> Decimal:
         """Parse amount string to Decimal"""
         # Remove currency symbols and convert to Decimal
-        amount_str = re.sub(r'[£$,]', '', amount_str)
+        amount_str = _AMOUNT_CLEAN_RE.sub('', amount_str)
         return Decimal(amount_str.strip())
     
     def _parse_date(self, date_str: str) -> datetime:
         """Parse date string (DD MMM YYYY)"""
-        return datetime.strptime(date_str.strip(), '%d %b %Y')
+        return _parse_statement_date(date_str.strip())
     
     def _extract_balances(self, page) -> tuple[Decimal, Decimal]:
         """Extract previous and new balance from first page"""
@@ -96,52 +111,49 @@ class JohnLewisPDFParser:
         Returns:
             String hash uniquely identifying the transaction
         """
-        # Create a string combining key transaction attributes
+        # Create a string combining the remaining transaction attributes,
+        # hashed after the subfolder prefix (once per process) and the date
         id_string = (
-            f"{self.subfolder}|"
-            f"{date.strftime('%Y%m%d')}|"
             f"{abs(amount):.2f}|"
             f"{description}"
         )
         
-        # Generate SHA-256 hash and take first 12 characters
-        return hashlib.sha256(id_string.encode()).hexdigest()[:12]
+        # Generate SHA-256 hash and take the first 6 bytes as 12 hex characters
+        hasher = id_hasher(f"{self.subfolder}|").copy()
+        hasher.update(date_id_bytes(date))
+        hasher.update(id_string.encode())
+        return hasher.digest()[:6].hex()
     
     def _parse_transactions(self, pdf) -> List[PDFTransaction]:
         """Extract transactions from pages starting from page 2 until a page has no transactions"""
         transactions = []
-        capturepattern = r'(\d{2} \w{3} \d{4}) (.*) ([+-]) £(\d+\.\d+)'
         
         for page in pdf.pages[1:]:  # Start from page 2 (index 1)
-            textlines = page.extract_text_lines()
+            text = page.extract_text()
             page_transactions = []
             
-            for line in textlines:
+            for match in _TRANSACTION_LINE_RE.finditer(text):
                 try:
-                    match = re.match(capturepattern, line['text'])
-                    if match:
-                        date_str, desc, amount_sign, amount_str = match.groups()
-                        amount = Decimal(amount_str) if amount_sign == '-' else -Decimal(amount_str)
-                        trans_type = 'DEBIT' if amount < 0 else 'CREDIT'
-                        
-                        # Generate transaction ID
-                        transaction_id = self._generate_transaction_id(
-                            self._parse_date(date_str),
-                            amount,
-                            desc.strip()
-                        )
-                        
-                        page_transactions.append(PDFTransaction(
-                            transaction_id=transaction_id,
-                            date=self._parse_date(date_str),
-                            amount=amount,  
-                            description=desc.strip(),
-                            type=trans_type,
-                            account_name=self.base_path.name
-                        ))
+                    date_str, desc, amount_sign, amount_str = match.groups()
+                    amount = Decimal(amount_str) if amount_sign == '-' else -Decimal(amount_str)
+                    trans_type = 'DEBIT' if amount < 0 else 'CREDIT'
+                    date = self._parse_date(date_str)
+                    desc = desc.strip()
+                    
+                    # Generate transaction ID
+                    transaction_id = self._generate_transaction_id(date, amount, desc)
+                    
+                    page_transactions.append(PDFTransaction(
+                        transaction_id=transaction_id,
+                        date=date,
+                        amount=amount,  
+                        description=desc,
+                        type=trans_type,
+                        account_name=self.base_path.name
+                    ))
 
                 except (ValueError, IndexError) as e:
-                    print(f"Error parsing row {line['text']}: {str(e)}")
+                    print(f"Error parsing row {match.group(0).strip()}: {str(e)}")
                     continue
             
             if not page_transactions:  # Stop if no transactions found on the page
@@ -151,44 +163,69 @@ class JohnLewisPDFParser:
         
         return transactions
     
-    def _parse_pdf_file(self, file_path: Path) -> Optional[PDFStatement]:
-        """Parse a PDF file and return a PDFStatement object"""
+    def _scan_pdf_file(self, file_path: Path) -> List[PDFTransaction]:
+        """Extract a PDF file's transactions, leaving the ledger lookup to _parse_pdf_file"""
+        with pdfplumber.open(file_path) as pdf:
+            return self._parse_transactions(pdf)
+    
+    def _parse_pdf_file(self, file_path: Path, scanned: Any = NOT_SCANNED) -> Optional[PDFStatement]:
+        """
+        Parse a PDF file and return a PDFStatement object
+        
+        Args:
+            file_path: PDF file to parse
+            scanned: Result of _scan_pdf_file for this file if it was already scanned or read from the cache
+        """
         try:
-            with pdfplumber.open(file_path) as pdf:
-
-                transactions = self._parse_transactions(pdf)
-                
-                if not transactions:
-                    return None
-                
-                # Get the start date from the first transaction
-                start_date = transactions[0].date
-                
-                # Read ledger amount from properties file
-                ledger_bal = self._read_ledger_amount(start_date)
-                if ledger_bal is None:
-                    print(f"Ledger amount not found for key: {start_date.strftime('%Y-%m-%d')} in {self.subfolder}.")
-                    return None
-                
-                running_total = ledger_bal
-                for t in transactions:
-                    running_total += t.amount
-                    t.running_total = running_total
-                
-                return PDFStatement(
-                    account_name=file_path.parent.name,
-                    start_balance=ledger_bal,
-                    end_balance=running_total,
-                    start_date=start_date,
-                    end_date=transactions[-1].date,
-                    transactions=transactions,
-                    ledger_balance=ledger_bal
-                )
+            if scanned is NOT_SCANNED:
+                scanned = self._scan_pdf_file(file_path)
+            elif isinstance(scanned, Exception):
+                raise scanned
+            transactions = scanned
+            
+            if not transactions:
+                return None
+            
+            # Get the start date from the first transaction
+            start_date = transactions[0].date
+            
+            # Read ledger amount from properties file
+            ledger_bal = self._read_ledger_amount(start_date)
+            if ledger_bal is None:
+                print(f"Ledger amount not found for key: {start_date.strftime('%Y-%m-%d')} in {self.subfolder}.")
+                return None
+            
+            running_total = set_running_totals(transactions, ledger_bal)
+            
+            return PDFStatement(
+                account_name=file_path.parent.name,
+                start_balance=ledger_bal,
+                end_balance=running_total,
+                start_date=start_date,
+                end_date=transactions[-1].date,
+                transactions=transactions,
+                ledger_balance=ledger_bal
+            )
                 
         except Exception as e:
             print(f"Error parsing file {file_path}: {str(e)}")
             return None
     
+    def _scan_pdf_files(self, file_paths: List[Path]) -> List[Tuple[Any, str]]:
+        """
+        Extract transactions from PDF files, reusing cached scans of unchanged
+        files so pdfplumber only opens new or modified ones. Ledger lookups are
+        left to the caller.
+        
+        Args:
+            file_paths: PDF files to scan
+            
+        Returns:
+            (scanned, output) per file in the order given
+        """
+        return scan_files_cached(self, self._scan_pdf_file, file_paths,
+                                 _SCAN_CACHE_NAME, _SCAN_CACHE_VERSION)
+    
     def parse_all_statements(self) -> List[PDFStatement]:
         """Parse all PDF files in the folder"""
         statements = []
@@ -197,9 +234,13 @@ class JohnLewisPDFParser:
             print(f"Folder not found at {self.base_path}")
             return statements
         
-        for file_path in self.base_path.glob("*.pdf"):
-            statement = self._parse_pdf_file(file_path)
+        # Scan the files first, then read the ledger and print in file order
+        file_paths = list_statement_files(self.base_path, ".pdf")
+        for file_path, (scanned, output) in zip(file_paths, self._scan_pdf_files(file_paths)):
+            print(output, end='')
+            statement = self._parse_pdf_file(file_path, scanned)
             if statement:
                 statements.append(statement)
         
-        return sorted(statements, key=lambda x: x.start_date) 
\ No newline at end of file
+        self.flush_ledger()
+        return sorted(statements, key=attrgetter('start_date')) 
\ No newline at end of file
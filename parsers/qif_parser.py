@@ -1,13 +1,41 @@
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Optional
-import re
-import hashlib
-import configparser
+from parsers.ledger import LedgerMixin
+from parsers.running_totals import set_running_totals
+from parsers.scan_cache import NOT_SCANNED, scan_files_cached
+from parsers.statement_files import list_statement_files
+from parsers.transaction_ids import date_id_bytes, id_hasher
+from sys import intern
+from typing import Any, List, Optional, Tuple
 
-@dataclass
+# Amount of a record with no T line
+_ZERO = Decimal('0')
+
+# Currency symbols removed from amounts
+_CURRENCY_SYMBOLS = str.maketrans('', '', '£$')
+
+# Per-folder cache of scanned QIF files, keyed on file name and checked
+# against each file's mtime and size; bump the version when scans change
+_SCAN_CACHE_NAME = 'qif_scan_cache.pkl'
+_SCAN_CACHE_VERSION = 2
+
+# QIF record lines stored as plain text: payee, reference number and category
+_QIF_TEXT_FIELDS = {'P': 'description', 'N': 'reference', 'L': 'category'}
+
+@lru_cache(maxsize=4096)
+def _parse_qif_date(date_str: str) -> datetime:
+    """Parse a DD/MM/YYYY (or MM/DD/YYYY) date once, as dates repeat across transactions"""
+    try:
+        return datetime.strptime(date_str, '%d/%m/%Y')
+    except ValueError:
+        # Try alternate format MM/DD/YYYY
+        return datetime.strptime(date_str, '%m/%d/%Y')
+
+@dataclass(slots=True)
 class QIFTransaction:
     """Represents a QIF transaction"""
     transaction_id: str
@@ -19,7 +47,7 @@ class QIFTransaction:
     reference: Optional[str] = None
     category: Optional[str] = None
     running_total: Optional[Decimal] = None
-@dataclass
+@dataclass(slots=True)
 class QIFStatement:
     """Represents a QIF statement"""
     account_name: str
@@ -27,47 +55,41 @@ class QIFStatement:
     start_date: datetime
     end_date: datetime
 
-class QIFParser:
+class QIFParser(LedgerMixin):
     """Parser for QIF files"""
     
     def __init__(self, base_path: str = "financial-data", subfolder: str = "mbna-credit"):
         self.base_path = Path(base_path) / subfolder
         self.subfolder = subfolder
         self.ledger_amounts_file = Path(base_path) / 'ledger_amounts.properties'
+        # IDs already generated this run, keyed on the attributes they hash
+        self._transaction_ids = {}
     
     def _read_ledger_amount(self, start_date: datetime) -> Optional[Decimal]:
         """Read the ledger amount from the properties file"""
-        config = configparser.ConfigParser()
-        config.read(self.ledger_amounts_file)
-
         # Create the key using subfolder name and statement start date
         key = f"{self.subfolder}|{start_date.strftime('%Y-%m-%d')}"
+        value = self._ledger_value(key)
         
-        if 'LedgerAmounts' not in config:
-            config['LedgerAmounts'] = {}
-
-        if key in config['LedgerAmounts']:
-            return Decimal(config['LedgerAmounts'][key])
+        if value is not None:
+            value = value.strip()
+            if not value:
+                # The key is present but its amount has not been filled in yet
+                return None
+            return Decimal(value)
         else:
             # If the key is absent, add it as an empty property
-            config['LedgerAmounts'][key] = ''
-            with open(self.ledger_amounts_file, 'w') as configfile:
-                config.write(configfile)
+            self._add_missing_ledger_key(key)
             return None  # Return None if the key was absent
 
     def _parse_date(self, date_str: str) -> datetime:
         """Parse QIF date format (DD/MM/YYYY)"""
-        try:
-            return datetime.strptime(date_str, '%d/%m/%Y')
-        except ValueError:
-            # Try alternate format MM/DD/YYYY
-            return datetime.strptime(date_str, '%m/%d/%Y')
+        return _parse_qif_date(date_str)
     
     def _parse_amount(self, amount_str: str) -> Decimal:
         """Parse amount string to Decimal"""
         # Remove currency symbols and convert to Decimal
-        amount_str = re.sub(r'[£$]', '', amount_str)
-        return Decimal(amount_str.strip())
+        return Decimal(amount_str.translate(_CURRENCY_SYMBOLS).strip())
     
     def _generate_transaction_id(self, date: datetime, amount: Decimal, description: str) -> str:
         """
@@ -81,101 +103,111 @@ class QIFParser:
         Returns:
             String hash uniquely identifying the transaction
         """
-        # Create a string combining key transaction attributes
+        # Overlapping QIF exports repeat transactions, so hash each one once
+        key = (date, abs(amount), description)
+        transaction_id = self._transaction_ids.get(key)
+        if transaction_id is not None:
+            return transaction_id
+        
+        # Create a string combining the remaining transaction attributes,
+        # hashed after the subfolder prefix (once per process) and the date
         id_string = (
-            f"{self.subfolder}|"
-            f"{date.strftime('%Y%m%d')}|"
             f"{abs(amount):.2f}|"
             f"{description}"
         )
         
-        # Generate SHA-256 hash and take first 12 characters
-        return hashlib.sha256(id_string.encode()).hexdigest()[:12]
+        # Generate SHA-256 hash and take the first 6 bytes as 12 hex characters
+        hasher = id_hasher(f"{self.subfolder}|").copy()
+        hasher.update(date_id_bytes(date))
+        hasher.update(id_string.encode())
+        transaction_id = self._transaction_ids[key] = hasher.digest()[:6].hex()
+        return transaction_id
     
-    def _parse_qif_file(self, file_path: Path) -> Optional[QIFStatement]:
-        """Parse a QIF file and return a QIFStatement object"""
-        try:
-            transactions = []
-            current_trans = {}
+    def _build_transaction(self, current_trans: dict) -> QIFTransaction:
+        """Build a QIFTransaction from the fields collected for one record"""
+        date = current_trans.get('date')
+        amount = current_trans.get('amount', _ZERO)
+        description = current_trans.get('description', '')
+        return QIFTransaction(
+            # Generate transaction ID
+            transaction_id=self._generate_transaction_id(date, amount, description),
+            date=date,
+            amount=amount,
+            description=description,
+            type=current_trans.get('type', 'OTHER'),
+            account_name=self.base_path.name,
+            reference=current_trans.get('reference'),
+            category=current_trans.get('category')
+        )
+    
+    def _scan_qif_file(self, file_path: Path) -> List[QIFTransaction]:
+        """Read a QIF file's transactions oldest first, leaving the ledger lookup to _parse_qif_file"""
+        transactions = []
+        current_trans = {}
+        
+        with open(file_path, 'r', encoding='utf-8') as file:
+            lines = file.read().split('\n')
+        
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
             
-            with open(file_path, 'r', encoding='utf-8') as file:
-                account_name = file_path.parent.name
-                
-                for line in file:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    identifier = line[0]
-                    value = line[1:].strip()
-                    
-                    if identifier == '^':  # End of transaction
-                        if current_trans:
-                            # Generate transaction ID
-                            transaction_id = self._generate_transaction_id(
-                                current_trans.get('date'),
-                                current_trans.get('amount', Decimal('0')),
-                                current_trans.get('description', '')
-                            )
-                            transactions.append(QIFTransaction(
-                                transaction_id=transaction_id,
-                                date=current_trans.get('date'),
-                                amount=current_trans.get('amount', Decimal('0')),
-                                description=current_trans.get('description', ''),
-                                type=current_trans.get('type', 'OTHER'),
-                                account_name=self.base_path.name,
-                                reference=current_trans.get('reference'),
-                                category=current_trans.get('category')
-                            ))
-                            current_trans = {}
-                    elif identifier == 'D':  # Date
-                        current_trans['date'] = self._parse_date(value)
-                    elif identifier == 'T':  # Amount
-                        amt = -self._parse_amount(value)
-                        current_trans['amount'] = amt
-                        current_trans['type'] = 'CREDIT' if amt >= 0 else 'DEBIT'
-                    elif identifier == 'P':  # Payee/Description
-                        current_trans['description'] = value
-                    elif identifier == 'N':  # Reference number
-                        current_trans['reference'] = value
-                    elif identifier == 'L':  # Category
-                        current_trans['category'] = value
-                
-                # Handle last transaction if exists
+            identifier = line[0]
+            value = line[1:].strip()
+            
+            field = _QIF_TEXT_FIELDS.get(identifier)
+            if field is not None:
+                # Categories repeat across records, so rows share one string per value
+                current_trans[field] = intern(value) if identifier == 'L' else value
+            elif identifier == '^':  # End of transaction
                 if current_trans:
-                    transaction_id = self._generate_transaction_id(
-                        current_trans.get('date'),
-                        current_trans.get('amount', Decimal('0')),
-                        current_trans.get('description', '')
-                    )
-                    transactions.append(QIFTransaction(
-                        transaction_id=transaction_id,
-                        date=current_trans.get('date'),
-                        amount=current_trans.get('amount', Decimal('0')),
-                        description=current_trans.get('description', ''),
-                        type=current_trans.get('type', 'OTHER'),
-                        account_name=self.base_path.name,
-                        reference=current_trans.get('reference'),
-                        category=current_trans.get('category')
-                    ))
+                    transactions.append(self._build_transaction(current_trans))
+                    current_trans = {}
+            elif identifier == 'D':  # Date
+                current_trans['date'] = self._parse_date(value)
+            elif identifier == 'T':  # Amount
+                amt = -self._parse_amount(value)
+                current_trans['amount'] = amt
+                current_trans['type'] = 'CREDIT' if amt >= 0 else 'DEBIT'
+        
+        # Handle last transaction if exists
+        if current_trans:
+            transactions.append(self._build_transaction(current_trans))
+        
+        # Sort transactions by date
+        transactions.reverse()
+        return transactions
+    
+    def _parse_qif_file(self, file_path: Path, compute_totals: bool = True,
+                        scanned: Any = NOT_SCANNED) -> Optional[QIFStatement]:
+        """
+        Parse a QIF file and return a QIFStatement object
+        
+        Args:
+            file_path: QIF file to parse
+            compute_totals: Set running totals on the transactions; callers that
+                recompute them after deduplicating can skip this pass
+            scanned: Result of _scan_qif_file for this file if it was already scanned or read from the cache
+        """
+        try:
+            if scanned is NOT_SCANNED:
+                scanned = self._scan_qif_file(file_path)
+            elif isinstance(scanned, Exception):
+                raise scanned
+            transactions = scanned
+            account_name = file_path.parent.name
             
             if not transactions:
                 return None
-            
-
-                
-            # Sort transactions by date
-            transactions.reverse()
 
             ledger_bal = self._read_ledger_amount(transactions[0].date)
             if ledger_bal is None:
-                    print(f"Ledger amount not found for key: {current_trans['date'].strftime('%Y-%m-%d')} in {self.subfolder}.")
+                    print(f"Ledger amount not found for key: {transactions[0].date.strftime('%Y-%m-%d')} in {self.subfolder}.")
                     return None
             
-            running_total = ledger_bal
-            for t in transactions:
-                running_total += t.amount
-                t.running_total = running_total
+            if compute_totals:
+                set_running_totals(transactions, ledger_bal)
             
             return QIFStatement(
                 account_name=account_name,
@@ -188,6 +220,20 @@ class QIFParser:
             print(f"Error parsing file {file_path}: {str(e)}")
             return None
     
+    def _scan_qif_files(self, file_paths: List[Path]) -> List[Tuple[Any, str]]:
+        """
+        Read QIF files, reusing cached scans of unchanged files. Ledger lookups
+        are left to the caller.
+        
+        Args:
+            file_paths: QIF files to scan
+            
+        Returns:
+            (scanned, output) per file in the order given
+        """
+        return scan_files_cached(self, self._scan_qif_file, file_paths,
+                                 _SCAN_CACHE_NAME, _SCAN_CACHE_VERSION)
+    
     def parse_all_statements(self) -> List[QIFStatement]:
         """Parse all QIF files in the folder and remove duplicate transactions"""
         statements = []
@@ -198,31 +244,32 @@ class QIFParser:
             return statements
         
         # First collect all files and sort by name to ensure consistent processing order
-        qif_files = sorted(self.base_path.glob("*.qif"))
+        qif_files = sorted(list_statement_files(self.base_path, ".qif"))
       
-        # Process each file
-        for file_path in qif_files:
-            statement = self._parse_qif_file(file_path)
+        # Process each file, scanning the files first, then reading the ledger
+        # and printing in file order
+        for file_path, (scanned, output) in zip(qif_files, self._scan_qif_files(qif_files)):
+            print(output, end='')
+            # Running totals are set once, after duplicates are removed
+            statement = self._parse_qif_file(file_path, compute_totals=False, scanned=scanned)
             if statement and statement.transactions:
                 # Filter out duplicates while preserving order
-                unique_transactions = []  
+                unique_transactions = []
                 for trans in statement.transactions:
-                    if trans.transaction_id not in seen_transactions:
-                        seen_transactions.add(trans.transaction_id)
-                        unique_transactions.append(trans)
+                    if trans.transaction_id in seen_transactions:
+                        continue
+                    seen_transactions.add(trans.transaction_id)
+                    unique_transactions.append(trans)
                 
                 # Only create statement if we have unique transactions
                 if unique_transactions:
                     # Sort transactions by date
-                    unique_transactions.sort(key=lambda x: x.date)
+                    unique_transactions.sort(key=attrgetter('date'))
                     
                     # Calculate running totals
                     ledger_bal = self._read_ledger_amount(unique_transactions[0].date)
                     if ledger_bal is not None:
-                        running_total = ledger_bal
-                        for t in unique_transactions:
-                            running_total += t.amount
-                            t.running_total = running_total
+                        set_running_totals(unique_transactions, ledger_bal)
                         
                         statements.append(QIFStatement(
                             account_name=self.base_path.name,
@@ -231,4 +278,5 @@ class QIFParser:
                             end_date=unique_transactions[-1].date
                         ))
         
-        return sorted(statements, key=lambda x: x.start_date) 
\ No newline at end of file
+        self.flush_ledger()
+        return sorted(statements, key=attrgetter('start_date')) 
\ No newline at end of file
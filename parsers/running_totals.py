@@ -0,0 +1,24 @@
+from decimal import Decimal
+from itertools import accumulate
+from operator import attrgetter
+from typing import Sequence
+
+_amount = attrgetter('amount')
+
+def set_running_totals(transactions: Sequence, opening_balance: Decimal) -> Decimal:
+    """
+    Set running_total on each transaction, in list order, from an opening balance
+
+    Args:
+        transactions: Transactions with amount and running_total attributes
+        opening_balance: Balance before the first transaction
+
+    Returns:
+        The running total after the last transaction
+    """
+    running_total = opening_balance
+    totals = accumulate(map(_amount, transactions), initial=opening_balance)
+    next(totals)  # skip the opening balance itself
+    for transaction, running_total in zip(transactions, totals):
+        transaction.running_total = running_total
+    return running_total
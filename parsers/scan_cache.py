@@ -0,0 +1,122 @@
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+import hashlib
+import io
+import os
+import pickle
+from parsers.file_cache import file_signature
+
+# Default for a parse method's scanned argument, for a file that has not
+# been scanned yet, so the method scans it itself
+NOT_SCANNED = object()
+
+# Cached scan per file name: ((mtime_ns, size), scanned, output)
+ScanCache = Dict[str, Tuple[Tuple[int, int], Any, str]]
+
+def scan_cache_path(folder: Path, cache_name: str) -> Path:
+    """
+    Path of a folder's scan cache, kept in the user's own cache directory
+    rather than beside the statements, as it is unpickled on every run
+    
+    Args:
+        folder: Statement folder the cache is for
+        cache_name: File name for this kind of scan, such as ofx_scan_cache.pkl
+    """
+    cache_dir = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'house-finance'
+    folder_key = hashlib.sha256(str(folder.resolve()).encode()).hexdigest()[:16]
+    return cache_dir / f"{folder_key}-{cache_name}"
+
+def load_scan_cache(cache_path: Path, folder: Path, parser_name: str, version: int) -> ScanCache:
+    """Load a folder's scan cache, treating a missing, unreadable or outdated cache as empty"""
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            cache = pickle.load(cache_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, EOFError, pickle.UnpicklingError,
+            # raised by pickle for malformed data or classes that have moved
+            ValueError, AttributeError, ImportError) as e:
+        print(f"Ignoring unreadable scan cache {cache_path}, rescanning {folder}: {str(e)}")
+        return {}
+    # Transaction IDs hash the folder name, so a renamed folder is rescanned
+    if (not isinstance(cache, dict) or cache.get('version') != version or cache.get('parser') != parser_name
+            or cache.get('folder') != str(folder.resolve())):
+        return {}
+    return cache['files']
+
+def save_scan_cache(cache_path: Path, folder: Path, parser_name: str, version: int, files: ScanCache) -> None:
+    """Write a folder's scan cache atomically, reporting and skipping it if the cache directory is not writable"""
+    cache = {'version': version, 'parser': parser_name, 'folder': str(folder.resolve()), 'files': files}
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    try:
+        cache_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as cache_file:
+            pickle.dump(cache, cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pickle.PicklingError) as e:
+        # The scans are still used this run; only the next run loses the cache
+        print(f"Could not save scan cache {cache_path}: {str(e)}")
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+def _scan_file(scan: Callable[[Path], Any], file_path: Path) -> Tuple[Any, str]:
+    """Scan one file, returning the result (or the error raised) and anything printed, which cache hits replay"""
+    output = io.StringIO()
+    with redirect_stdout(output):
+        try:
+            scanned = scan(file_path)
+        except Exception as e:
+            scanned = e
+    return scanned, output.getvalue()
+
+def scan_files_cached(parser: Any, scan: Callable[[Path], Any],
+                      file_paths: List[Path], cache_name: str, version: int) -> List[Tuple[Any, str]]:
+    """
+    Scan files with a parser's scan method, reusing cached scans of unchanged files
+    
+    Files are scanned one after another: parse_all_account_folders already
+    parses each folder in its own worker process, so a pool here would nest.
+
+    Args:
+        parser: Parser whose class name and base_path folder key the cache
+        scan: Parser method scanning one file, leaving ledger lookups to the caller
+        file_paths: Files to scan
+        cache_name: File name for this kind of scan in the cache directory
+        version: Cache format version; bump when the scan output changes
+
+    Returns:
+        (scanned, output) per file in the order given
+    """
+    parser_name = type(parser).__name__
+    folder = parser.base_path
+    cache_path = scan_cache_path(folder, cache_name)
+    cached = load_scan_cache(cache_path, folder, parser_name, version)
+    files = {}
+    results = {}
+    to_scan = []
+    for file_path in file_paths:
+        signature = file_signature(file_path)
+        entry = cached.get(file_path.name)
+        if entry is not None and entry[0] == signature:
+            files[file_path.name] = entry
+            results[file_path] = entry[1:]
+        else:
+            files[file_path.name] = (signature,)
+            to_scan.append(file_path)
+
+    scans = [_scan_file(scan, file_path) for file_path in to_scan]
+
+    for file_path, (scanned, output) in zip(to_scan, scans):
+        results[file_path] = (scanned, output)
+        if isinstance(scanned, Exception):
+            # Errors are not cached, so the file is scanned again next run
+            del files[file_path.name]
+        else:
+            files[file_path.name] += (scanned, output)
+
+    if to_scan or files.keys() != cached.keys():
+        save_scan_cache(cache_path, folder, parser_name, version, files)
+    return [results[file_path] for file_path in file_paths]
@@ -0,0 +1,16 @@
+from pathlib import Path
+from typing import List
+import os
+
+def list_statement_files(folder: Path, suffix: str) -> List[Path]:
+    """
+    List the statement files in a folder with one directory scan, in the
+    order the directory returns them as Path.glob would
+
+    Args:
+        folder: Account folder to scan
+        suffix: File extension including the dot, e.g. ".ofx"
+    """
+    with os.scandir(folder) as entries:
+        return [folder / entry.name for entry in entries
+                if entry.name.endswith(suffix) and entry.is_file()]
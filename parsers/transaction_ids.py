@@ -0,0 +1,28 @@
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+
+@lru_cache(maxsize=None)
+def id_hasher(prefix: str):
+    """
+    SHA-256 state after hashing a fixed transaction ID prefix
+
+    Kept per process rather than on parser instances, which are pickled for
+    worker processes. Callers copy it and hash the rest of each ID string.
+
+    Args:
+        prefix: Constant start of the ID string, e.g. "{subfolder}|"
+    """
+    return hashlib.sha256(prefix.encode())
+
+@lru_cache(maxsize=4096)
+def date_id_bytes(date: datetime) -> bytes:
+    """
+    Encoded "YYYYMMDD|" ID field for a transaction date
+
+    Statements repeat the same few hundred dates, so each is formatted once.
+
+    Args:
+        date: Transaction date
+    """
+    return f"{date:%Y%m%d}|".encode()
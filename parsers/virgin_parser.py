@@ -1,13 +1,45 @@
 from dataclasses import dataclass
 from datetime import datetime
 from decimal import Decimal, InvalidOperation as DecimalInvalidOperation
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import List, Optional, Dict
+from parsers.ledger import LedgerMixin
+from parsers.running_totals import set_running_totals
+from parsers.scan_cache import NOT_SCANNED, scan_files_cached
+from parsers.statement_files import list_statement_files
+from parsers.transaction_ids import date_id_bytes, id_hasher
+from sys import intern
+from typing import Any, List, Optional, Dict, Tuple
 import csv
-import configparser
-import hashlib
 
-@dataclass
+# Currency symbol and thousands separators removed from amounts
+_AMOUNT_SYMBOLS = str.maketrans('', '', '£,')
+
+# Read buffer for statement files, larger than the 8 KiB default to cut read calls
+_READ_BUFFER_SIZE = 1 << 17
+
+# Columns read from each statement row, in the order they are unpacked
+_CSV_COLUMNS = (
+    'Transaction Date', 'Posting Date', 'Billing Amount', 'Merchant', 'Merchant City',
+    'Merchant State', 'Merchant Postcode', 'Debit or Credit', 'SICMCC Code', 'Status',
+    'Transaction Currency', 'Additional Card Holder', 'Card Used',
+)
+
+# Per-folder cache of scanned CSV files, keyed on file name and checked
+# against each file's mtime and size; bump the version when scans change
+_SCAN_CACHE_NAME = 'csv_scan_cache.pkl'
+_SCAN_CACHE_VERSION = 1
+
+@lru_cache(maxsize=4096)
+def _parse_csv_date(date_str: str) -> datetime:
+    """Parse a YYYY-MM-DD (or DD/MM/YYYY) date once, as dates repeat across rows"""
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d')
+    except ValueError:
+        return datetime.strptime(date_str, '%d/%m/%Y')
+
+@dataclass(slots=True)
 class VirginTransaction:
     """Represents a Virgin Money credit card transaction"""
     transaction_id: str
@@ -26,7 +58,7 @@ class VirginTransaction:
     status: Optional[str] = None
     running_total: Optional[Decimal] = None
 
-@dataclass
+@dataclass(slots=True)
 class VirginStatement:
     """Represents a Virgin Money credit card statement"""
     account_name: str
@@ -34,7 +66,7 @@ class VirginStatement:
     end_date: datetime
     transactions: List[VirginTransaction]
 
-class VirginCSVParser:
+class VirginCSVParser(LedgerMixin):
     """Parser for Virgin Money CSV files"""
     
     def __init__(self, base_path: str = "financial-data", subfolder: str = "virgin-credit"):
@@ -44,40 +76,29 @@ class VirginCSVParser:
     
     def _read_ledger_amount(self, start_date: datetime) -> Optional[Decimal]:
         """Read the ledger amount from the properties file"""
-        config = configparser.ConfigParser()
-        config.read(self.ledger_amounts_file)
-
         # Create the key using subfolder name and statement start date
         key = f"{self.subfolder}|{start_date.strftime('%Y-%m-%d')}"
+        value = self._ledger_value(key)
         
-        if 'LedgerAmounts' not in config:
-            config['LedgerAmounts'] = {}
-
-        if key in config['LedgerAmounts']:
-            v = config['LedgerAmounts'][key].strip()
+        if value is not None:
+            v = value.strip()
             if v == '':
                 return Decimal(0)
             else:
                 return Decimal(v)
         else:
             # If the key is absent, add it as an empty property
-            config['LedgerAmounts'][key] = ''
-            with open(self.ledger_amounts_file, 'w') as configfile:
-                config.write(configfile)
+            self._add_missing_ledger_key(key)
             return None  # Return None if the key was absent
     
     def _parse_date(self, date_str: str) -> datetime:
         """Parse date from CSV format"""
-        try:
-            return datetime.strptime(date_str, '%Y-%m-%d')
-        except ValueError:
-            return datetime.strptime(date_str, '%d/%m/%Y')
+        return _parse_csv_date(date_str)
     
     def _parse_amount(self, amount_str: str) -> Decimal:
         """Parse amount string to Decimal"""
         # Remove currency symbols and convert to Decimal
-        amount_str = amount_str.replace('£', '').replace(',', '')
-        return Decimal(amount_str.strip())
+        return Decimal(amount_str.translate(_AMOUNT_SYMBOLS).strip())
     
     def _generate_transaction_id(self, date: datetime, amount: Decimal, description: str) -> str:
         """
@@ -91,76 +112,107 @@ class VirginCSVParser:
         Returns:
             String hash uniquely identifying the transaction
         """
-        # Create a string combining key transaction attributes
+        # Create a string combining the remaining transaction attributes,
+        # hashed after the subfolder prefix (once per process) and the date
         id_string = (
-            f"{self.subfolder}|"
-            f"{date.strftime('%Y%m%d')}|"
             f"{abs(amount):.2f}|"
             f"{description}"
         )
         
-        # Generate SHA-256 hash and take first 12 characters
-        return hashlib.sha256(id_string.encode()).hexdigest()[:12]
+        # Generate SHA-256 hash and take the first 6 bytes as 12 hex characters
+        hasher = id_hasher(f"{self.subfolder}|").copy()
+        hasher.update(date_id_bytes(date))
+        hasher.update(id_string.encode())
+        return hasher.digest()[:6].hex()
     
-    def _parse_csv_file(self, file_path: Path) -> Optional[VirginStatement]:
-        """Parse a CSV file and return a VirginStatement object"""
-        try:
-            transactions = []
+    def _scan_csv_file(self, file_path: Path) -> List[VirginTransaction]:
+        """Read a CSV file's transactions sorted by date, leaving the ledger lookup to _parse_csv_file"""
+        transactions = []
+        
+        with open(file_path, 'r', encoding='utf-8-sig', buffering=_READ_BUFFER_SIZE) as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            if header is None:
+                return transactions
+            
+            # Resolve the column positions once from the header row
+            columns = {name: index for index, name in enumerate(header)}
+            (trans_date_col, post_date_col, amount_col, merchant_col, city_col, state_col,
+             postcode_col, debit_credit_col, sic_col, status_col, currency_col,
+             card_holder_col, card_used_col) = (columns[name] for name in _CSV_COLUMNS)
             
-            with open(file_path, 'r', encoding='utf-8-sig') as csvfile:
-                reader = csv.DictReader(csvfile)
+            width = len(header)
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) < width:
+                    # Missing trailing fields read as None, as csv.DictReader gives them
+                    row += [None] * (width - len(row))
+                debit_credit = row[debit_credit_col]
+                if debit_credit not in ['DBIT', 'CRDT']:
+                    debit_credit = row[sic_col]
+                # Parse amount and determine transaction type
+                amount = self._parse_amount(row[amount_col])
+                trans_type = intern(debit_credit.upper())
+                if trans_type == 'DBIT':
+                    amount = -amount
                 
-                for row in reader:
-                    if row['Debit or Credit'] not in ['DBIT', 'CRDT']:
-                        row['Debit or Credit'] = row['SICMCC Code']
-                    # Parse amount and determine transaction type
-                    amount = self._parse_amount(row['Billing Amount'])
-                    trans_type = row['Debit or Credit'].upper()
-                    if trans_type == 'DBIT':
-                        amount = -amount
-                    
-                    # Get transaction date for ledger lookup
-                    trans_date = self._parse_date(row['Transaction Date'])
-                    trans_date_key = trans_date.strftime('%Y%m%d')
-                    
-                    # Create transaction object
-                    transaction = VirginTransaction(
-                        transaction_id=self._generate_transaction_id(
-                            trans_date,
-                            amount,
-                            row['Merchant'].strip()
-                        ),
-                        date=trans_date,
-                        post_date=self._parse_date(row['Posting Date']),
-                        amount=amount,
-                        description=row['Merchant'].strip(),
-                        type=trans_type,
-                        merchant_category=row['SICMCC Code'].strip() if row['SICMCC Code'] else None,
-                        merchant_city=row['Merchant City'].strip() if row['Merchant City'] else None,
-                        merchant_state=row['Merchant State'].strip() if row['Merchant State'] else None,
-                        merchant_postcode=row['Merchant Postcode'].strip() if row['Merchant Postcode'] else None,
-                        currency=row['Transaction Currency'].strip() if row['Transaction Currency'] else None,
-                        card_holder=row['Additional Card Holder'].strip() if row['Additional Card Holder'] else None,
-                        card_used=row['Card Used'].strip() if row['Card Used'] else None,
-                        status=row['Status'].strip() if row['Status'] else None
-                    )
-                    transactions.append(transaction)
+                # Get transaction date for ledger lookup
+                trans_date = self._parse_date(row[trans_date_col])
+                merchant = row[merchant_col].strip()
+                
+                # Create transaction object, interning the low-cardinality fields
+                # so rows share one string per distinct value
+                transaction = VirginTransaction(
+                    transaction_id=self._generate_transaction_id(
+                        trans_date,
+                        amount,
+                        merchant
+                    ),
+                    date=trans_date,
+                    post_date=self._parse_date(row[post_date_col]),
+                    amount=amount,
+                    description=merchant,
+                    type=trans_type,
+                    merchant_category=intern(row[sic_col].strip()) if row[sic_col] else None,
+                    merchant_city=row[city_col].strip() if row[city_col] else None,
+                    merchant_state=intern(row[state_col].strip()) if row[state_col] else None,
+                    merchant_postcode=row[postcode_col].strip() if row[postcode_col] else None,
+                    currency=intern(row[currency_col].strip()) if row[currency_col] else None,
+                    card_holder=intern(row[card_holder_col].strip()) if row[card_holder_col] else None,
+                    card_used=intern(row[card_used_col].strip()) if row[card_used_col] else None,
+                    status=intern(row[status_col].strip()) if row[status_col] else None
+                )
+                transactions.append(transaction)
+        
+        # Sort transactions by date
+        transactions.sort(key=attrgetter('date'))
+        return transactions
+    
+    def _parse_csv_file(self, file_path: Path, scanned: Any = NOT_SCANNED) -> Optional[VirginStatement]:
+        """
+        Parse a CSV file and return a VirginStatement object
+        
+        Args:
+            file_path: CSV file to parse
+            scanned: Result of _scan_csv_file for this file if it was already scanned or read from the cache
+        """
+        try:
+            if scanned is NOT_SCANNED:
+                scanned = self._scan_csv_file(file_path)
+            elif isinstance(scanned, Exception):
+                raise scanned
+            transactions = scanned
             
             if not transactions:
                 return None
-                
-            # Sort transactions by date
-            transactions.sort(key=lambda x: x.date)
 
             ledger_bal = self._read_ledger_amount(transactions[0].date)
             if ledger_bal is None:
                     print(f"Ledger amount not found for key: {transactions[0].date.strftime('%Y-%m-%d')} in {self.subfolder}.")
                     return None
             
-            running_total = ledger_bal
-            for t in transactions:
-                running_total += t.amount
-                t.running_total = running_total
+            set_running_totals(transactions, ledger_bal)
             
             # Create statement
             return VirginStatement(
@@ -174,6 +226,20 @@ class VirginCSVParser:
             print(f"Error parsing file {file_path}: {str(e)}")
             return None
     
+    def _scan_csv_files(self, file_paths: List[Path]) -> List[Tuple[Any, str]]:
+        """
+        Read CSV files, reusing cached scans of unchanged files. Ledger lookups
+        are left to the caller.
+        
+        Args:
+            file_paths: CSV files to scan
+            
+        Returns:
+            (scanned, output) per file in the order given
+        """
+        return scan_files_cached(self, self._scan_csv_file, file_paths,
+                                 _SCAN_CACHE_NAME, _SCAN_CACHE_VERSION)
+    
     def parse_all_statements(self) -> List[VirginStatement]:
         """Parse all CSV files in the Virgin folder"""
         statements = []
@@ -182,10 +248,14 @@ class VirginCSVParser:
             print(f"Virgin folder not found at {self.base_path}")
             return statements
         
-        # Process all CSV files
-        for file_path in self.base_path.glob("*.csv"):
-            statement = self._parse_csv_file(file_path)
+        # Process all CSV files, scanning them first, then reading the ledger
+        # and printing in file order
+        file_paths = list_statement_files(self.base_path, ".csv")
+        for file_path, (scanned, output) in zip(file_paths, self._scan_csv_files(file_paths)):
+            print(output, end='')
+            statement = self._parse_csv_file(file_path, scanned)
             if statement:
                 statements.append(statement)
         
-        return sorted(statements, key=lambda x: x.start_date) 
\ No newline at end of file
+        self.flush_ledger()
+        return sorted(statements, key=attrgetter('start_date')) 
\ No newline at end of file
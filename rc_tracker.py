@@ -2,12 +2,75 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from decimal import Decimal
 from typing import Dict, List, Any
+from operator import attrgetter
+from itertools import compress, pairwise
 import re
 import json
+import os
+import heapq
+from bisect import bisect_left
 from tabulate import tabulate
 from parse_all_transactions import parse_all_account_folders
-from collections import defaultdict
-from Levenshtein import distance
+from parsers.file_cache import JSON_FILES
+from collections import defaultdict, deque
+
+# Length of each charge interval in days, for matching new transactions
+_INTERVAL_DAYS = {
+    'monthly': 30,
+    'quarterly': 90,
+    'biannual': 180,
+    'annual': 365,
+    'weekly': 7,
+    'biweekly': 14
+}
+
+# Length of each charge interval in months, for the monthly cost
+_INTERVAL_MONTHS = {
+    'weekly': Decimal('0.25'),  # 1/4 month
+    'biweekly': Decimal('0.5'),  # 1/2 month
+    'monthly': Decimal('1'),
+    'quarterly': Decimal('3'),
+    'biannual': Decimal('6'),
+    'annual': Decimal('12')
+}
+
+# Columns of the transaction tables in the recurring charges report
+_TABLE_FIELDS = attrgetter('date', 'transaction_id', 'type', 'amount', 'description')
+
+def _load_config(config_file: Path) -> Dict[str, Any]:
+    """
+    Load a JSON config file, treating a missing file as empty and reusing the
+    last load in this process while the file is unchanged
+    
+    Each caller gets its own copy, so changes only stick once saved with
+    _save_config.
+    """
+    try:
+        return JSON_FILES.get(config_file)
+    except FileNotFoundError:
+        return {}
+
+def _save_config(config_file: Path, config: Dict[str, Any]) -> None:
+    """
+    Write a JSON config file in one go and replace the original atomically,
+    so an interrupted run cannot leave it truncated; what was written is kept
+    for the next load
+    """
+    text = json.dumps(config, indent=4)
+    tmp_file = config_file.with_name(config_file.name + '.tmp')
+    tmp_file.write_text(text)
+    os.replace(tmp_file, config_file)
+    JSON_FILES.put(config_file, json.loads(text))
+
+def combine_transactions(statements_by_folder: Dict[str, List[Any]]) -> List[Any]:
+    """Combine all transactions from all statements into a single list sorted by date"""
+    # Sort each folder on its own, then merge; ties keep folder order as a full sort would
+    sorted_folders = [
+        sorted((trans for statement in statements for trans in statement.transactions), key=attrgetter('date'))
+        for statements in statements_by_folder.values()
+    ]
+    
+    return list(heapq.merge(*sorted_folders, key=attrgetter('date')))
 
 class RC_Tracker:
     """Tracks Monthly Recurring Charges using regex patterns"""
@@ -26,64 +89,93 @@ class RC_Tracker:
                 - amount_range: Dict with min/max/avg amounts
         """
         # Load existing patterns
-        rc_file = Path("config/rc_patterns.json")
-        if rc_file.exists():
-            with open(rc_file, 'r') as f:
-                rc_patterns = json.load(f)
-        else:
-            rc_patterns = {}
+        rc_file = self.config_path
+        rc_patterns = _load_config(rc_file)
 
         # Get all transactions sorted by date
-        self.all_transactions = sorted(
-            self._combine_transactions(statements_by_folder),
-            key=lambda x: x.date
-        )
+        self.all_transactions = combine_transactions(statements_by_folder)
         
         
         recurring_charges = {}
         
+        # Compile each pattern once, and flag the transactions that match any of them
+        # so descriptions that match nothing are skipped for every pattern
+        compiled_patterns = {
+            charge_name: re.compile(config.get('pattern', ''), re.IGNORECASE)
+            for charge_name, config in rc_patterns.items()
+        }
+        may_match = self._match_any(compiled_patterns.values())
+        candidates = list(compress(self.all_transactions, may_match))
+        
+        # Index the saved IDs so a single pass collects every charge's known
+        # transactions; an ID saved under several charges is known to each of them
+        known_ids_by_charge = {
+            charge_name: set(config.get('transaction_ids', []))
+            for charge_name, config in rc_patterns.items()
+        }
+        charges_by_id = defaultdict(list)
+        for charge_name, known_ids in known_ids_by_charge.items():
+            for transaction_id in known_ids:
+                charges_by_id[transaction_id].append(charge_name)
+        known_by_charge = defaultdict(list)
+        for trans in self.all_transactions:
+            for charge_name in charges_by_id.get(trans.transaction_id, ()):
+                known_by_charge[charge_name].append(trans)
+        
         # Process known patterns
         for charge_name, config in rc_patterns.items():
-            pattern = config.get('pattern', '')
+            pattern = compiled_patterns[charge_name]
             interval = config.get('interval', 'monthly')
-            known_ids = set(config.get('transaction_ids', []))
+            saved_ids = config.get('transaction_ids', [])
+            known_ids = known_ids_by_charge[charge_name]
             status = config.get('status', 'running')
             status_change_date = config.get('status_change_date', None)
             
             # Find matching transactions
-            new_matching_trans = []
-            known_transactions = []
+            known_transactions = known_by_charge.get(charge_name, [])
             new_transactions = []
             new_transaction_ids = []
             
-            # for this charge, find all known transactions and all new transactions
-            for trans in self.all_transactions:
-                if trans.transaction_id in known_ids:
-                    known_transactions.append(trans)
-                elif re.search(pattern, trans.description, re.IGNORECASE):
-                    new_matching_trans.append(trans)
+            # for this charge, find all new transactions among those matching any pattern
+            new_matching_trans = [
+                trans for trans in candidates
+                if trans.transaction_id not in known_ids and pattern.search(trans.description)
+            ]
 
             sanitised_transactions = self.sanitise(known_transactions)
+            # sanitise returns transactions in date order; dates are whole days,
+            # so compare them as day ordinals
+            sanitised_days = [t.date.toordinal() for t in sanitised_transactions]
             # Look for similar descriptions with similar intervals
             avg_amount = sum(t.amount for t in sanitised_transactions) / len(sanitised_transactions) if sanitised_transactions else None                   
             # Check for similar amount and description
+            check_amount = bool(known_transactions) and avg_amount != 0
             for trans in new_matching_trans:
-                good_amount_diff = (abs(trans.amount - avg_amount) / abs(avg_amount) < 0.2) if known_transactions and avg_amount!= 0 else True
-                good_interval = self._fits_interval_pattern(trans.date, sanitised_transactions, interval)
-                if interval == 'irregular' or (good_amount_diff and good_interval):
-                    new_transactions.append(trans)
-                    new_transaction_ids.append(trans.transaction_id)
+                # Irregular charges take every match, so only check the others
+                if interval != 'irregular':
+                    good_amount_diff = (abs(trans.amount - avg_amount) / abs(avg_amount) < 0.2) if check_amount else True
+                    if not (good_amount_diff and self._fits_interval_pattern(trans.date.toordinal(), sanitised_days, interval)):
+                        continue
+                new_transactions.append(trans)
+                new_transaction_ids.append(trans.transaction_id)
+            # Only the amounts are used, so the combined list is not re-sorted
             full_transactions = known_transactions + new_transactions
-            # Sort transactions by date
-            full_transactions.sort(key=lambda x: x.date)
             
             # Calculate amount ranges
             if full_transactions:
-                amounts = [abs(t.amount) for t in full_transactions]
+                # Single pass over the amounts for min/max/total
+                total = min_amount = max_amount = abs(full_transactions[0].amount)
+                for t in full_transactions[1:]:
+                    amount = abs(t.amount)
+                    total += amount
+                    if amount < min_amount:
+                        min_amount = amount
+                    elif amount > max_amount:
+                        max_amount = amount
                 amount_range = {
-                    'min': str(min(amounts)),
-                    'max': str(max(amounts)),
-                    'avg': str(sum(amounts) / len(amounts))
+                    'min': str(min_amount),
+                    'max': str(max_amount),
+                    'avg': str(total / len(full_transactions))
                 }
             else:
                 amount_range = {
@@ -92,20 +184,26 @@ class RC_Tracker:
                     'avg': '0'
                 }
             
+            # The saved IDs are normally already sorted and unique, so merge the
+            # new IDs into them rather than re-sorting the lot
+            if len(saved_ids) != len(known_ids) or any(a > b for a, b in pairwise(saved_ids)):
+                saved_ids = sorted(known_ids)
+            transaction_ids = list(heapq.merge(saved_ids, sorted(new_transaction_ids)))
+            
             # Store results
             recurring_charges[charge_name] = {
                 'known_transactions': known_transactions,
                 'new_transactions': new_transactions,
                 'interval': interval,
                 'amount_range': amount_range,
-                'transaction_ids': sorted(list(known_ids) + new_transaction_ids),
+                'transaction_ids': transaction_ids,
                 'status': status,
                 'status_change_date': status_change_date
             }
             
             # Update pattern file
             rc_patterns[charge_name].update({
-                'transaction_ids': sorted(list(known_ids) + new_transaction_ids),
+                'transaction_ids': transaction_ids,
                 'last_updated': datetime.now().isoformat(),
                 'amount_range': amount_range,
                 'status': status,
@@ -113,11 +211,31 @@ class RC_Tracker:
             })
         
         # Save updated patterns
-        with open(rc_file, 'w') as f:
-            json.dump(rc_patterns, f, indent=4)
+        _save_config(rc_file, rc_patterns)
         
         return recurring_charges
 
+    def _match_any(self, patterns: List[re.Pattern]) -> List[bool]:
+        """
+        Flag which of the loaded transactions match at least one pattern
+        
+        Args:
+            patterns: Compiled charge patterns
+            
+        Returns:
+            List of flags aligned with self.all_transactions
+        """
+        patterns = list(patterns)
+        # Groups would be renumbered in an alternation, breaking backreferences,
+        # so only union patterns without groups and otherwise check every transaction
+        if not patterns or any(p.groups for p in patterns):
+            return [True] * len(self.all_transactions)
+        try:
+            union = re.compile('|'.join(f'(?:{p.pattern})' for p in patterns), re.IGNORECASE)
+        except re.error:
+            return [True] * len(self.all_transactions)
+        return [union.search(t.description) is not None for t in self.all_transactions]
+
     def _calculate_avg_interval(self, dates: List[datetime]) -> timedelta:
         """Calculate average interval between dates"""
         if len(dates) < 2:
@@ -130,50 +248,34 @@ class RC_Tracker:
         
         return timedelta(days=sum(intervals) / len(intervals))
 
-    def _fits_interval_pattern(self, date: datetime, existing_trans: List[Any], interval: str) -> bool:
+    def _fits_interval_pattern(self, day: int, existing_days: List[int], interval: str) -> bool:
         """
         Check if a date fits the existing transaction pattern
         
         Args:
-            date: Date to check
-            existing_trans: List of existing transactions
+            day: Day ordinal of the date to check
+            existing_days: Day ordinals of the existing transactions, in ascending order
             interval: Configured interval ('monthly', 'quarterly', 'annual', 'irregular', etc)
         """
-        if not existing_trans:
+        if not existing_days:
             return True
         
         # Always return True for irregular intervals
-        if interval.lower() == 'irregular':
+        interval = interval.lower()
+        if interval == 'irregular':
             return True
         
         # Convert interval to days
-        interval_days = {
-            'monthly': 30,
-            'quarterly': 90,
-            'biannual': 180,
-            'annual': 365,
-            'weekly': 7,
-            'biweekly': 14
-        }.get(interval.lower(), 30)  # Default to monthly if unknown
-        
-        # Get closest transaction date
-        existing_dates = [t.date for t in existing_trans]
-        closest_date = min(existing_dates, key=lambda d: abs(d - date))
+        interval_days = _INTERVAL_DAYS.get(interval, 30)  # Default to monthly if unknown
+        
+        # Get days to the closest transaction; it is one of the two neighbours
+        # of the day's insertion point in the sorted days
+        index = bisect_left(existing_days, day)
+        days_diff = min(abs(day - existing_day) for existing_day in existing_days[max(index - 1, 0):index + 1])
         
         # Check if the interval is reasonable (allow 20% variation)
-        days_diff = abs((date - closest_date).days)
         return abs(days_diff - interval_days) <= (interval_days * 0.2)
     
-    def _combine_transactions(self, statements_by_folder: Dict[str, List[Any]]) -> List[Any]:
-        """Combine all transactions from all statements into a single list"""
-        all_transactions = []
-        
-        for statements in statements_by_folder.values():
-            for statement in statements:
-                all_transactions.extend(statement.transactions)
-        
-        return sorted(all_transactions, key=lambda x: x.date)
-    
     def track_recurring_charges(self, statements_by_folder: Dict[str, List[Any]]) -> Dict[str, Dict[str, Any]]:
         """
         Find and track all recurring charges
@@ -196,141 +298,119 @@ class RC_Tracker:
         output_dir.mkdir(parents=True, exist_ok=True)
         output_file = output_dir / "recurring_charges.txt"
         
-        with open(output_file, 'w') as f:
-            f.write("Recurring Charges Report\n")
-            f.write("=" * 100 + "\n\n")
+        parts = []
+        parts.append("Recurring Charges Report\n")
+        parts.append("=" * 100 + "\n\n")
+        
+        for charge_name, charge_data in recurring_charges.items():
+            known_transactions = charge_data['known_transactions']
+            new_transactions = charge_data['new_transactions']
             
-            for charge_name, charge_data in recurring_charges.items():
-                known_transactions = charge_data['known_transactions']
-                new_transactions = charge_data['new_transactions']
-                
-                if not (known_transactions or new_transactions):
-                    continue
-                    
-                interval = charge_data['interval']
-                amount_range = charge_data['amount_range']
-                
-                f.write(f"\n{charge_name} ({interval}) - {charge_data['status'].upper()}\n")
-                if charge_data['status_change_date']:
-                    f.write(f"Status changed: {charge_data['status_change_date']}\n")
-                f.write("-" * (len(charge_name) + len(interval) + len(charge_data['status']) + 5) + "\n")
-                
-                # Write statistics with rounded amounts
-                total_transactions = len(known_transactions) + len(new_transactions)
-                f.write(f"Total occurrences: {total_transactions}\n")
-                f.write(f"Known transactions: {len(known_transactions)}\n")
-                f.write(f"New transactions: {len(new_transactions)}\n")
-                f.write(f"Average amount: £{float(amount_range['avg']):.2f}\n")
-                f.write(f"Min amount: £{float(amount_range['min']):.2f}\n")
-                f.write(f"Max amount: £{float(amount_range['max']):.2f}\n\n")
-                
-                # Write known transactions table
-                if known_transactions:
-                    f.write("Known Transactions:\n")
-                    table_data = [
-                        [
-                            t.date.date(),
-                            t.transaction_id,
-                            t.type,
-                            f"£{t.amount:.2f}",
-                            t.description
-                        ]
-                        for t in sorted(known_transactions, key=lambda x: x.date)
-                    ]
-                    
-                    f.write(tabulate(
-                        table_data,
-                        headers=['Date', 'Transaction ID', 'Type', 'Amount', 'Description'],
-                        tablefmt='grid'
-                    ))
-                    f.write("\n\n")
+            if not (known_transactions or new_transactions):
+                continue
                 
-                # Write new transactions table
-                if new_transactions:
-                    f.write("New Transactions:\n")
-                    table_data = [
-                        [
-                            t.date.date(),
-                            t.transaction_id,
-                            t.type,
-                            f"£{t.amount:.2f}",
-                            t.description
-                        ]
-                        for t in sorted(new_transactions, key=lambda x: x.date)
-                    ]
-                    
-                    f.write(tabulate(
-                        table_data,
-                        headers=['Date', 'Transaction ID', 'Type', 'Amount', 'Description'],
-                        tablefmt='grid'
-                    ))
-                    f.write("\n\n")
+            interval = charge_data['interval']
+            amount_range = charge_data['amount_range']
             
-            # Write summary table with rounded amounts and status
-            active_total = Decimal('0')
-            cancelled_total = Decimal('0')
+            parts.append(f"\n{charge_name} ({interval}) - {charge_data['status'].upper()}\n")
+            if charge_data['status_change_date']:
+                parts.append(f"Status changed: {charge_data['status_change_date']}\n")
+            parts.append("-" * (len(charge_name) + len(interval) + len(charge_data['status']) + 5) + "\n")
             
-            summary_data = []
-            for name, data in recurring_charges.items():
-                if not (data['known_transactions'] or data['new_transactions']):
-                    continue
-                    
-                avg_amount = Decimal(data['amount_range']['avg'])
-                all_transactions = data['known_transactions'] + data['new_transactions']
+            # Write statistics with rounded amounts
+            total_transactions = len(known_transactions) + len(new_transactions)
+            parts.append(f"Total occurrences: {total_transactions}\n")
+            parts.append(f"Known transactions: {len(known_transactions)}\n")
+            parts.append(f"New transactions: {len(new_transactions)}\n")
+            parts.append(f"Average amount: £{float(amount_range['avg']):.2f}\n")
+            parts.append(f"Min amount: £{float(amount_range['min']):.2f}\n")
+            parts.append(f"Max amount: £{float(amount_range['max']):.2f}\n\n")
+            
+            # Write known transactions table
+            if known_transactions:
+                parts.append("Known Transactions:\n")
+                parts.append(self._transactions_table(known_transactions))
+                parts.append("\n\n")
+            
+            # Write new transactions table
+            if new_transactions:
+                parts.append("New Transactions:\n")
+                parts.append(self._transactions_table(new_transactions))
+                parts.append("\n\n")
+        
+        # Write summary table with rounded amounts and status
+        active_total = Decimal('0')
+        cancelled_total = Decimal('0')
+        
+        summary_data = []
+        for name, data in recurring_charges.items():
+            if not (data['known_transactions'] or data['new_transactions']):
+                continue
                 
-                # Calculate monthly cost based on interval
-                if data['interval'].lower() == 'irregular':
-                    # Calculate days between first and last transaction
-                    all_dates = [t.date for t in all_transactions]
-                    first_date = min(all_dates)
-                    last_date = max(all_dates)
-                    days_diff = (last_date - first_date).days + 1  # Add 1 to include both start and end dates
-                    months = Decimal(days_diff) / Decimal('30')
-                    
-                    # Calculate monthly cost based on actual period
-                    total_spent = avg_amount * len(all_transactions)
-                    monthly_cost = total_spent / max(months, Decimal('1'))  # Avoid division by zero
-                else:
-                    # Convert interval to months
-                    interval_months = {
-                        'weekly': Decimal('0.25'),  # 1/4 month
-                        'biweekly': Decimal('0.5'),  # 1/2 month
-                        'monthly': Decimal('1'),
-                        'quarterly': Decimal('3'),
-                        'biannual': Decimal('6'),
-                        'annual': Decimal('12')
-                    }.get(data['interval'].lower(), Decimal('1'))
-                    
-                    monthly_cost = avg_amount / interval_months
+            avg_amount = Decimal(data['amount_range']['avg'])
+            all_transactions = data['known_transactions'] + data['new_transactions']
+            
+            # Calculate monthly cost based on interval
+            if data['interval'].lower() == 'irregular':
+                # Calculate days between first and last transaction
+                all_dates = [t.date for t in all_transactions]
+                first_date = min(all_dates)
+                last_date = max(all_dates)
+                days_diff = (last_date - first_date).days + 1  # Add 1 to include both start and end dates
+                months = Decimal(days_diff) / Decimal('30')
                 
-                if data['status'] == 'running':
-                    active_total += monthly_cost
-                else:
-                    cancelled_total += monthly_cost
+                # Calculate monthly cost based on actual period
+                total_spent = avg_amount * len(all_transactions)
+                monthly_cost = total_spent / max(months, Decimal('1'))  # Avoid division by zero
+            else:
+                # Convert interval to months
+                interval_months = _INTERVAL_MONTHS.get(data['interval'].lower(), Decimal('1'))
                 
-                summary_data.append([
-                    f"{name} ({data['status'].upper()})",
-                    len(data['known_transactions']),
-                    len(data['new_transactions']),
-                    f"£{float(avg_amount):.2f}",
-                    f"£{float(monthly_cost):.2f}"
-                ])
+                monthly_cost = avg_amount / interval_months
             
-            f.write("\nSummary\n")
-            f.write("=" * 50 + "\n")
-            f.write(tabulate(
-                summary_data,
-                headers=['Charge (Status)', 'Known', 'New', 'Amount', 'Monthly Cost'],
-                tablefmt='grid'
-            ))
+            if data['status'] == 'running':
+                active_total += monthly_cost
+            else:
+                cancelled_total += monthly_cost
             
-            # Write totals
-            f.write(f"\n\nActive Monthly Total: £{float(active_total):.2f}")
-            f.write(f"\nCancelled Monthly Total: £{float(cancelled_total):.2f}")
-            f.write(f"\nOverall Monthly Total: £{float(active_total + cancelled_total):.2f}")
+            summary_data.append([
+                f"{name} ({data['status'].upper()})",
+                len(data['known_transactions']),
+                len(data['new_transactions']),
+                f"£{float(avg_amount):.2f}",
+                f"£{float(monthly_cost):.2f}"
+            ])
+        
+        parts.append("\nSummary\n")
+        parts.append("=" * 50 + "\n")
+        parts.append(tabulate(
+            summary_data,
+            headers=['Charge (Status)', 'Known', 'New', 'Amount', 'Monthly Cost'],
+            tablefmt='grid'
+        ))
+        
+        # Write totals
+        parts.append(f"\n\nActive Monthly Total: £{float(active_total):.2f}")
+        parts.append(f"\nCancelled Monthly Total: £{float(cancelled_total):.2f}")
+        parts.append(f"\nOverall Monthly Total: £{float(active_total + cancelled_total):.2f}")
+        
+        output_file.write_text(''.join(parts))
         
         print(f"Report written to {output_file}")
 
+    def _transactions_table(self, transactions: List[Any]) -> str:
+        """Render transactions as a grid table in date order"""
+        table_data = [
+            [date.date(), transaction_id, trans_type, f"£{amount:.2f}", description]
+            for date, transaction_id, trans_type, amount, description
+            in map(_TABLE_FIELDS, sorted(transactions, key=attrgetter('date')))
+        ]
+        return tabulate(
+            table_data,
+            headers=['Date', 'Transaction ID', 'Type', 'Amount', 'Description'],
+            tablefmt='grid'
+        )
+
     def generate_budget_report(self, recurring_charges: Dict[str, Dict[str, Any]], output_dir: Path = Path("output/reports")) -> None:
         """Generate budget report showing last 3 months, current month spend and targets"""
         output_dir.mkdir(parents=True, exist_ok=True)
@@ -338,16 +418,12 @@ class RC_Tracker:
         
         # Load budget targets
         budget_file = Path("config/budget_targets.json")
-        if budget_file.exists():
-            with open(budget_file, 'r') as f:
-                budget_targets = json.load(f)
-        else:
-            budget_targets = {}
+        budget_targets = _load_config(budget_file)
         
         # Get current month and previous 3 complete months
         today = datetime.now()
         current_month_date = today.replace(day=1)
-        current_month_key = current_month_date.strftime('%Y-%m')
+        current_month_key = current_month_date.year * 12 + current_month_date.month - 1
         
         # Get the 3 complete months + the current month
         recent_months = []
@@ -359,8 +435,8 @@ class RC_Tracker:
         
         recent_months.reverse()  # Oldest first
 
-        # get recent months keys
-        recent_months_keys = [month.strftime('%Y-%m') for month in recent_months]
+        # get recent months keys, as a count of months (year * 12 + month - 1)
+        recent_months_keys = [month.year * 12 + month.month - 1 for month in recent_months]
         
         # Calculate monthly totals for each charge
         budget_data = []
@@ -369,12 +445,12 @@ class RC_Tracker:
         for name, data in recurring_charges.items():
             all_transactions = data['known_transactions'] + data['new_transactions']
             
-            # Initialise monthly totals with the previous months as keys and empty lists as values
-            monthly_totals = {key: [] for key in recent_months_keys}
+            # Initialise monthly totals with the previous months as keys and empty deques as values
+            monthly_totals = {key: deque() for key in recent_months_keys}
             
             # Populate monthly totals with all transactions
             for trans in all_transactions:
-                trans_month_key = trans.date.strftime('%Y-%m')
+                trans_month_key = trans.date.year * 12 + trans.date.month - 1
                 # Store tuple of (amount, date) to track transaction order
                 if trans_month_key in monthly_totals:
                     monthly_totals[trans_month_key].append((abs(trans.amount), trans.date))
@@ -385,8 +461,7 @@ class RC_Tracker:
                 for i in range(len(recent_months_keys)):
                     if not monthly_totals[recent_months_keys[i]] and i < len(recent_months_keys) - 1 and len(monthly_totals[recent_months_keys[i + 1]]) > 0:
                         next_month_key = recent_months_keys[i + 1]
-                        monthly_totals[recent_months_keys[i]].append(monthly_totals[next_month_key][0])
-                        monthly_totals[next_month_key] = monthly_totals[next_month_key][1:]
+                        monthly_totals[recent_months_keys[i]].append(monthly_totals[next_month_key].popleft())
             
             # Convert lists to totals (sum only the amounts, not the dates)
             monthly_sums = {
@@ -396,8 +471,8 @@ class RC_Tracker:
             
             # Calculate 3-month average if no target exists
             previous_amounts = [
-                monthly_sums.get(m.strftime('%Y-%m'), Decimal('0')) 
-                for m in recent_months[0:3]
+                monthly_sums.get(month_key, Decimal('0')) 
+                for month_key in recent_months_keys[0:3]
             ]
             
             if previous_amounts:
@@ -429,8 +504,7 @@ class RC_Tracker:
         # Save updated targets if new ones were added
         if targets_updated:
             budget_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(budget_file, 'w') as f:
-                json.dump(budget_targets, f, indent=4)
+            _save_config(budget_file, budget_targets)
         
         # Sort by percentage descending
         budget_data.sort(key=lambda x: x['percentage'], reverse=True)
@@ -500,35 +574,28 @@ class RC_Tracker:
             List of transactions with cancelling pairs removed
         """
         # Sort transactions by date
-        sorted_trans = sorted(transactions, key=lambda x: x.date)
+        sorted_trans = sorted(transactions, key=attrgetter('date'))
         
         # Track which transactions to remove
         to_remove = set()
         
-        # Look for cancelling pairs
-        for i in range(len(sorted_trans)-1):
-            if i in to_remove:
-                continue
-            
-            current = sorted_trans[i]
-            
-            # Look ahead for cancelling transaction within 7 days
-            for j in range(i+1, len(sorted_trans)):
-                if j in to_remove:
-                    continue
-                
-                next_trans = sorted_trans[j]
-                days_between = (next_trans.date - current.date).days
-                
-                # Stop looking if more than 7 days ahead
-                if days_between > 7:
-                    break
-                
-                # Check if transactions cancel each other out
-                if abs(current.amount + next_trans.amount) < Decimal('0.01'):      
-                    to_remove.add(i)
-                    to_remove.add(j)
-                    break
+        # Unpaired transactions by amount rounded to the penny, oldest first
+        pending = defaultdict(deque)
+        
+        # Pair each transaction with the oldest unpaired one it cancels within 7 days
+        # Dates are whole days, so compare them as day ordinals
+        for index, trans in enumerate(sorted_trans):
+            day = trans.date.toordinal()
+            amount = trans.amount.quantize(Decimal('0.01'))
+            partners = pending.get(-amount)
+            # Drop partners more than 7 days back, as they are too old for later transactions too
+            while partners and day - partners[0][0] > 7:
+                partners.popleft()
+            if partners:
+                to_remove.add(partners.popleft()[1])
+                to_remove.add(index)
+            else:
+                pending[amount].append((day, index))
         
         # Return transactions that weren't removed
         return [t for i, t in enumerate(sorted_trans) if i not in to_remove]
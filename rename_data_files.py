@@ -1,7 +1,41 @@
 from pathlib import Path
 from datetime import datetime
+from typing import Iterator, Optional
+import mmap
+import os
 import re
 
+# Server timestamp in an OFX header
+_DTSERVER_RE = re.compile(rb'<DTSERVER>(\d{14})')
+
+def _read_server_date(file_path: Path) -> Optional[str]:
+    """Find the first DTSERVER timestamp in an OFX file, searching it in place via mmap"""
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            match = _DTSERVER_RE.search(mapped)
+            return match.group(1).decode('ascii') if match else None
+
+def _iter_subfolders(folder: Path) -> Iterator[Path]:
+    """
+    Yield every folder below a folder, each folder's subfolders before theirs
+    
+    Uses the file types cached by os.scandir rather than a stat per entry, and
+    like Path.rglob lists symlinked folders without descending into them and
+    skips folders it cannot read.
+    """
+    try:
+        with os.scandir(folder) as it:
+            subfolders = [entry for entry in it if entry.is_dir()]
+    except OSError:
+        return
+    for entry in subfolders:
+        yield Path(entry.path)
+    for entry in subfolders:
+        if not entry.is_symlink():
+            yield from _iter_subfolders(entry.path)
+
 def rename_data_files(base_path: Path) -> None:
     """
     Recursively search through folders and rename data files
@@ -10,30 +44,28 @@ def rename_data_files(base_path: Path) -> None:
         base_path: Base directory to start search from
     """
     # Walk through all subfolders
-    for folder_path in base_path.rglob('*'):
-        if not folder_path.is_dir():
-            continue
-            
+    for folder_path in _iter_subfolders(base_path):
         # Get folder name for prefix
         folder_name = folder_path.name.lower()
         
-        # Look for data files in this folder
-        for file_path in folder_path.glob('data*'):
+        # Look for data files in this folder, listing it before any are renamed
+        try:
+            with os.scandir(folder_path) as it:
+                data_files = [Path(entry.path) for entry in it if entry.name.startswith('data')]
+        except OSError:
+            # Unreadable folders are skipped, as Path.glob does
+            continue
+        for file_path in data_files:
             try:
                 if file_path.suffix.lower() in ['.qif', '.pdf', '.csv']:
                     # For QIF files, use current date/time
                     date_formatted = datetime.now().strftime('%Y-%m-%d-%H-%M-%S-%f')
                 else:
-                    # For OFX files, extract date from content
-                    with open(file_path, 'r', encoding='iso-8859-1') as file:
-                        content = file.read()
-                        
-                    # Look for DTSERVER tag with date
-                    match = re.search(r'<DTSERVER>(\d{14})', content)
-                    if not match:
+                    # For OFX files, extract date from the DTSERVER tag
+                    date_str = _read_server_date(file_path)
+                    if not date_str:
                         continue
                         
-                    date_str = match.group(1)
                     date_obj = datetime.strptime(date_str, '%Y%m%d%H%M%S')
                     date_formatted = date_obj.strftime('%Y-%m-%d-%H-%M-%S')
                 
@@ -0,0 +1,28 @@
+import unittest
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from rc_tracker import RC_Tracker
+
+def _trans(day: int, amount: str) -> SimpleNamespace:
+    """Build a minimal transaction dated in January 2024"""
+    return SimpleNamespace(date=datetime(2024, 1, day), amount=Decimal(amount))
+
+class SanitiseTest(unittest.TestCase):
+    """RC_Tracker.sanitise pairing of cancelling transactions"""
+
+    def test_unquantised_amounts_cancel(self):
+        transactions = [_trans(1, '-12.3'), _trans(3, '12.300000001')]
+        self.assertEqual(RC_Tracker().sanitise(transactions), [])
+
+    def test_mixed_scale_amounts_cancel(self):
+        transactions = [_trans(1, '12.30'), _trans(2, '-12.3'), _trans(4, '7.00')]
+        self.assertEqual([t.amount for t in RC_Tracker().sanitise(transactions)], [Decimal('7.00')])
+
+    def test_pair_more_than_seven_days_apart_is_kept(self):
+        transactions = [_trans(1, '-12.30'), _trans(9, '12.30')]
+        self.assertEqual(len(RC_Tracker().sanitise(transactions)), 2)
+
+if __name__ == "__main__":
+    unittest.main()